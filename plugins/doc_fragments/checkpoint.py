@@ -0,0 +1,12 @@
+class ModuleDocFragment(object):
+    DOCUMENTATION = '''options:
+  checkpoint_file:
+    description:
+    - File the progress is written to every few seconds.
+    - An interrupted or failed run started again with the same file and parameters resumes from it, a checkpoint of other parameters is discarded.
+    - Modules changing a given list of objects store the completed and pending keys and skip completed objects on resume. Modules deleting or scanning what they find only store the count, processed objects are not found again.
+    - Under `async` the file can be read (e.g. with `slurp`) to watch `percent` and `throughput`, the final status is returned in `progress`.
+    - A finished checkpoint is ignored by the next run. Not written in check mode.
+    required: false
+    type: path
+'''
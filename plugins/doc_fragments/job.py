@@ -0,0 +1,23 @@
+class ModuleDocFragment(object):
+    DOCUMENTATION = '''options:
+  run_now:
+    description:
+    - Trigger the job once now, additionally to managing its schedule.
+    - If no schedule is given, only the job is triggered.
+    required: false
+    type: bool
+    default: false
+  wait:
+    description:
+    - Wait for a job triggered with `run_now` to finish.
+    - Progress is returned in `progress`, status and timing in `run`.
+    required: false
+    type: bool
+    default: true
+  wait_timeout:
+    description:
+    - Seconds to wait for a triggered job to finish.
+    required: false
+    type: int
+    default: 3600
+'''
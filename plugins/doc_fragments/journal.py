@@ -0,0 +1,22 @@
+class ModuleDocFragment(object):
+    DOCUMENTATION = '''options:
+  journal_path:
+    description:
+    - Local journal file of applied desired states, shared by all tasks and hosts using it.
+    - If the desired state did not change since it was last applied and verified within `journal_ttl`, the module exits without any API call.
+    - Changes made outside of Ansible are only detected once the entry expired or with `journal_verify`.
+    required: false
+    type: path
+  journal_ttl:
+    description:
+    - Seconds a verified journal entry is trusted.
+    required: false
+    type: int
+    default: 86400
+  journal_verify:
+    description:
+    - Always verify against Harbor and refresh the journal entry, e.g. for a periodic full verification run.
+    required: false
+    type: bool
+    default: false
+'''
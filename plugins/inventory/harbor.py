@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+name: harbor
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Harbor projects as inventory
+description:
+  - Creates one host per Harbor project with metadata, quota and optionally repositories as host variables.
+  - Projects are grouped into C(harbor_public), C(harbor_private) and C(harbor_proxy_cache).
+  - Pages are fetched in parallel, results can be cached with the inventory cache plugins.
+  - The configuration file name must end with C(harbor.yml) or C(harbor.yaml).
+extends_documentation_fragment:
+  - constructed
+  - inventory_cache
+options:
+  plugin:
+    description:
+    - Name of the plugin.
+    required: true
+    choices: ['swisstxt.harbor.harbor']
+  api_url:
+    description:
+    - V2 API URL of Harbor (`https://localhost/api/v2.0`)
+    required: true
+    type: str
+    env:
+      - name: HARBOR_API_URL
+  api_username:
+    description:
+    - Username of user with admin privileges
+    required: true
+    type: str
+    env:
+      - name: HARBOR_API_USERNAME
+  api_password:
+    description:
+    - Password of user with admin privileges
+    required: true
+    type: str
+    env:
+      - name: HARBOR_API_PASSWORD
+  include_repositories:
+    description:
+    - Add the repositories of each project as C(harbor_repositories).
+    type: bool
+    default: false
+  page_size:
+    description:
+    - Number of items requested per API call.
+    type: int
+    default: 100
+  workers:
+    description:
+    - Number of API calls in parallel.
+    type: int
+    default: 8
+'''
+
+EXAMPLES = '''
+# harbor.yml
+plugin: swisstxt.harbor.harbor
+api_url: https://harbor.example.com/api/v2.0
+api_username: admin
+api_password: secret
+include_repositories: true
+cache: true
+cache_plugin: ansible.builtin.jsonfile
+cache_connection: /tmp/harbor_inventory
+cache_timeout: 3600
+keyed_groups:
+  - key: harbor_metadata.auto_scan | default('false')
+    prefix: auto_scan
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from ansible.errors import AnsibleError
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable, Constructable
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+    NAME = 'swisstxt.harbor.harbor'
+
+    def verify_file(self, path):
+        if super(InventoryModule, self).verify_file(path):
+            return path.endswith(('harbor.yml', 'harbor.yaml'))
+        return False
+
+    def getPage(self, path, page):
+        page_request = requests.get(
+            f"{self.api_url}{path}",
+            auth=self.auth,
+            params={"page": page, "page_size": self.page_size}
+        )
+        if not page_request.status_code == 200:
+            raise AnsibleError(f"Harbor request {path} failed with HTTP status code {page_request.status_code}: {page_request.text}")
+        return page_request
+
+    def listAll(self, path):
+        # First page tells the total, all other pages are fetched in parallel
+        first = self.getPage(path, 1)
+        items = first.json() or []
+        total = int(first.headers.get('X-Total-Count', len(items)))
+        pages = range(2, (total + self.page_size - 1) // self.page_size + 1)
+        for page_request in self.executor.map(lambda page: self.getPage(path, page), pages):
+            items.extend(page_request.json() or [])
+        return items
+
+    def fetch(self):
+        projects = self.listAll("/projects")
+        quotas = {
+            str(quota['ref']['id']): quota
+            for quota in self.listAll("/quotas")
+            if quota.get('ref')
+        }
+
+        repositories = {}
+        if self.get_option('include_repositories'):
+            # Separate pool, listAll waits for pages fetched by self.executor
+            names = [project['name'] for project in projects]
+            with ThreadPoolExecutor(max_workers=self.get_option('workers')) as project_executor:
+                listings = project_executor.map(lambda name: self.listAll(f"/projects/{name}/repositories"), names)
+                for name, listing in zip(names, listings):
+                    repositories[name] = [repository['name'] for repository in listing]
+
+        results = []
+        for project in projects:
+            quota = quotas.get(str(project['project_id']), {})
+            results.append({
+                "name": project['name'],
+                "project_id": project['project_id'],
+                "metadata": project.get('metadata') or {},
+                "registry_id": project.get('registry_id') or None,
+                "repo_count": project.get('repo_count', 0),
+                "quota_hard": (quota.get('hard') or {}).get('storage'),
+                "quota_used": (quota.get('used') or {}).get('storage'),
+                "repositories": repositories.get(project['name'])
+            })
+        return results
+
+    def populate(self, results):
+        for group in ['harbor_public', 'harbor_private', 'harbor_proxy_cache']:
+            self.inventory.add_group(group)
+
+        strict = self.get_option('strict')
+        for project in results:
+            host = self.inventory.add_host(project['name'])
+            hostvars = {
+                "harbor_project_id": project['project_id'],
+                "harbor_metadata": project['metadata'],
+                "harbor_registry_id": project['registry_id'],
+                "harbor_repo_count": project['repo_count'],
+                "harbor_quota_hard": project['quota_hard'],
+                "harbor_quota_used": project['quota_used'],
+            }
+            if project['repositories'] is not None:
+                hostvars['harbor_repositories'] = project['repositories']
+            for key, value in hostvars.items():
+                self.inventory.set_variable(host, key, value)
+
+            if project['metadata'].get('public') == 'true':
+                self.inventory.add_child('harbor_public', host)
+            else:
+                self.inventory.add_child('harbor_private', host)
+            if project['registry_id']:
+                self.inventory.add_child('harbor_proxy_cache', host)
+
+            self._set_composite_vars(self.get_option('compose'), hostvars, host, strict=strict)
+            self._add_host_to_composed_groups(self.get_option('groups'), hostvars, host, strict=strict)
+            self._add_host_to_keyed_groups(self.get_option('keyed_groups'), hostvars, host, strict=strict)
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+        self._read_config_data(path)
+
+        self.api_url = self.get_option('api_url').rstrip("/")
+        self.auth = (self.get_option('api_username'), self.get_option('api_password'))
+        self.page_size = self.get_option('page_size')
+
+        cache_key = self.get_cache_key(path)
+        user_cache_setting = self.get_option('cache')
+        attempt_to_read_cache = user_cache_setting and cache
+        cache_needs_update = user_cache_setting and not cache
+
+        results = None
+        if attempt_to_read_cache:
+            try:
+                results = self._cache[cache_key]
+            except KeyError:
+                cache_needs_update = True
+
+        if results is None:
+            with ThreadPoolExecutor(max_workers=self.get_option('workers')) as self.executor:
+                results = self.fetch()
+
+        if cache_needs_update:
+            self._cache[cache_key] = results
+
+        self.populate(results)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import (absolute_import, division, print_function)
+__metaclass__ = type
+
+DOCUMENTATION = '''
+---
+name: harbor_schedule
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Compute non-overlapping Harbor maintenance schedules
+description:
+  - Places garbage collection, purge audit and scan all of every given Harbor instance one after another into a maintenance window.
+  - Returns one dict per instance with a `schedule_cron` per job, to be used with the schedule modules of this collection.
+  - If the jobs do not fit into one window they are spread over the given weekdays.
+options:
+  _terms:
+    description:
+    - Names of Harbor instances, or dicts with `name` and `durations` to override durations per instance.
+    required: true
+  window_start:
+    description:
+    - Start of the maintenance window (`HH:MM`).
+    type: str
+    default: '01:00'
+  window_end:
+    description:
+    - End of the maintenance window (`HH:MM`). May be before `window_start` for windows crossing midnight.
+    type: str
+    default: '05:00'
+  durations:
+    description:
+    - Observed duration in seconds per job, for example the `p95` returned by `harbor_job_metrics`.
+    type: dict
+    default: {gc: 3600, purgeaudit: 600, scan_all: 3600}
+  jobs:
+    description:
+    - Jobs to schedule, in order of execution.
+    type: list
+    elements: str
+    default: ['gc', 'purgeaudit', 'scan_all']
+  margin:
+    description:
+    - Factor applied to durations as safety margin.
+    type: float
+    default: 1.2
+  gap:
+    description:
+    - Minutes between two jobs.
+    type: int
+    default: 5
+  weekdays:
+    description:
+    - Days of week (0 = Sunday) jobs may be spread over. By default every job runs daily and all jobs must fit into one window.
+    type: list
+    elements: int
+'''
+
+EXAMPLES = '''
+- name: Compute schedules
+  set_fact:
+    harbor_schedules: "{{ query('swisstxt.harbor.harbor_schedule', 'harbor-a', 'harbor-b', window_start='22:00', window_end='04:00') }}"
+
+- name: Apply garbage collection schedule
+  swisstxt.harbor.harbor_garbage_collection:
+    api_url: "{{ api_url }}"
+    api_username: "{{ api_username }}"
+    api_password: "{{ api_password }}"
+    delete_untagged: true
+    schedule_cron: "{{ (harbor_schedules | selectattr('instance', 'equalto', inventory_hostname) | first).gc }}"
+'''
+
+RETURN = '''
+_list:
+  description:
+  - One dict per instance with `instance`, a cron per job and the computed `windows`.
+  type: list
+  elements: dict
+'''
+
+import math
+
+from ansible.errors import AnsibleError
+from ansible.plugins.lookup import LookupBase
+
+
+class LookupModule(LookupBase):
+    MINUTES_PER_DAY = 24 * 60
+
+    def parseClock(self, value):
+        try:
+            hour, minute = value.split(":")
+            minutes = int(hour) * 60 + int(minute)
+        except ValueError:
+            raise AnsibleError(f"Invalid time {value}, expected HH:MM")
+        if not 0 <= minutes < self.MINUTES_PER_DAY:
+            raise AnsibleError(f"Invalid time {value}, expected HH:MM")
+        return minutes
+
+    def clock(self, minute_of_week):
+        hour, minute = divmod(minute_of_week % self.MINUTES_PER_DAY, 60)
+        return f"{hour:02d}:{minute:02d}"
+
+    def cron(self, minute_of_week, daily):
+        # Harbor uses cron with seconds: `sec min hour dom month dow`
+        day, minute_of_day = divmod(minute_of_week, self.MINUTES_PER_DAY)
+        hour, minute = divmod(minute_of_day, 60)
+        weekday = "*" if daily else str(day % 7)
+        return f"0 {minute} {hour} * * {weekday}"
+
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+
+        window_start = self.parseClock(self.get_option('window_start'))
+        window_end = self.parseClock(self.get_option('window_end'))
+        if window_end <= window_start:
+            window_end += self.MINUTES_PER_DAY
+
+        weekdays = self.get_option('weekdays')
+        daily = not weekdays
+        days = [0] if daily else sorted(set(weekdays))
+        margin = self.get_option('margin')
+        gap = self.get_option('gap')
+
+        # Pack all jobs of all instances sequentially, continuing in the next day's window on overflow
+        day_index = 0
+        cursor = window_start
+        schedules = []
+        for instance in terms:
+            if isinstance(instance, dict):
+                name = instance['name']
+                durations = dict(self.get_option('durations'), **instance.get('durations', {}))
+            else:
+                name = instance
+                durations = self.get_option('durations')
+
+            schedule = {
+                "instance": name,
+                "windows": {}
+            }
+            for job in self.get_option('jobs'):
+                if job not in durations:
+                    raise AnsibleError(f"No duration given for job {job}")
+                length = math.ceil(float(durations[job]) * margin / 60)
+                if length > window_end - window_start:
+                    raise AnsibleError(f"Job {job} of {name} does not fit into the maintenance window")
+
+                if cursor + length > window_end:
+                    day_index += 1
+                    cursor = window_start
+                    if day_index >= len(days):
+                        raise AnsibleError("Jobs do not fit into the maintenance window, add weekdays or widen the window")
+
+                start = days[day_index] * self.MINUTES_PER_DAY + cursor
+                schedule[job] = self.cron(start, daily)
+                schedule['windows'][job] = {
+                    "start": self.clock(start),
+                    "end": self.clock(start + length),
+                    "weekday": None if daily else (start // self.MINUTES_PER_DAY) % 7
+                }
+                cursor += length + gap
+
+            schedules.append(schedule)
+
+        return schedules
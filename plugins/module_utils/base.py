@@ -1,19 +1,94 @@
 from ansible.module_utils.urls import url_argument_spec
 from ansible.module_utils.basic import AnsibleModule
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from urllib.parse import quote
+import json
+import random
 import requests
+import threading
+import time
+
+from ansible_collections.swisstxt.harbor.plugins.module_utils.checkpoint import \
+    HarborCheckpoint
+from ansible_collections.swisstxt.harbor.plugins.module_utils.journal import \
+    HarborJournal
 
 __metaclass__ = type
 
+class HarborApiError(Exception):
+    # Raised instead of fail_json where the request may run in a worker thread
+    pass
+
 class HarborBaseModule(object):
+    TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
     COMMON_ARG_SPEC = dict(
         api_url=dict(type='str', required=True),
         api_username=dict(type='str', required=True),
         api_password=dict(type='str', required=True, no_log=True)
     )
 
+    JOURNAL_ARG_SPEC = dict(
+        journal_path=dict(type='path', required=False),
+        journal_ttl=dict(type='int', required=False, default=86400),
+        journal_verify=dict(type='bool', required=False, default=False)
+    )
+    CHECKPOINT_ARG_SPEC = dict(
+        checkpoint_file=dict(type='path', required=False)
+    )
+
+    # Options controlling how a module runs, not the desired state of an
+    # object. Modules add their own, the same name may be state in another.
+    RUN_CONTROL_OPTIONS = ['journal_path', 'journal_ttl', 'journal_verify', 'checkpoint_file']
+
     def __init__(self):
         self.api_url = self.module.params['api_url']
         self.auth=(self.module.params['api_username'],self.module.params['api_password'])
+        self.journal = None
+
+        # A thread pool needs at least one worker
+        workers = self.module.params.get('workers')
+        if workers is not None and workers < 1:
+            self.module.fail_json(msg=f"workers must be at least 1, got {workers}")
+
+    def openCheckpoint(self, total=None, keys=True):
+        # Nothing gets done in check mode, so nothing is persisted either
+        path = None if self.module.check_mode else self.module.params['checkpoint_file']
+        return HarborCheckpoint(path, total, spec=self.desiredParams(), keys=keys)
+
+    def desiredParams(self):
+        # Parameters describing the desired state, without secrets (no_log)
+        # as their hash gets written to disk
+        ignored = set(self.RUN_CONTROL_OPTIONS)
+        ignored.update(option for option, spec in self.argspec.items() if spec.get('no_log'))
+        return {
+            option: value for option, value in self.module.params.items()
+            if option not in ignored
+        }
+
+    def journalCheck(self, kind, identity):
+        # Exit without reading Harbor if the same desired state was applied
+        # and verified within journal_ttl
+        if not self.module.params.get('journal_path'):
+            return
+        self.journal = HarborJournal(self.module.params['journal_path'], self.api_url)
+        self.journal_key = self.journal.key(kind, identity)
+        self.journal_hash = self.journal.specHash(self.desiredParams())
+        if self.module.params['journal_verify']:
+            return
+        if self.journal.isFresh(self.journal_key, self.journal_hash, self.module.params['journal_ttl']):
+            self.result['journal_skipped'] = True
+            self.module.exit_json(**self.result)
+
+    def journalRecord(self):
+        # Harbor matches the desired state, remember when it was verified
+        if self.journal is None or self.module.check_mode:
+            return
+        try:
+            self.journal.record(self.journal_key, self.journal_hash)
+        except OSError as e:
+            self.module.warn(f"Could not write journal {self.journal.path}: {e}")
 
     def getProjectByName(self, name):
         r = requests.get(
@@ -36,11 +111,45 @@ class HarborBaseModule(object):
 
         return None
 
+    def findProjectByName(self, name):
+        # Like getProjectByName, but safe to call from worker threads
+        project_request = requests.get(
+            f"{self.api_url}/projects",
+            auth=self.auth,
+            params={"name": name}
+        )
+        if not project_request.status_code == 200:
+            raise HarborApiError(self.requestParse(project_request))
+
+        for project in project_request.json() or []:
+            if project['name'] == name:
+                return project
+        return None
+
+    def parseTime(self, value):
+        # Harbor returns `2021-04-20T08:33:13.000Z`, users pass `2021-04-20 08:33:13`
+        return datetime.strptime(value[:19].replace("T", " "), self.TIME_FORMAT)
+
     def quotaBits(self, gigabytes):
         # Convert quota from user input (GiB) to api (bits)
         bits = -1 if gigabytes == -1 else gigabytes * (1024 ** 3)
         return bits
 
+    def setDiff(self, before, after, header=None):
+        # Only render the diff if it was requested (--diff)
+        if not self.module._diff:
+            return
+        diff = {
+            "before": json.dumps(before, indent=4),
+            "after": json.dumps(after, indent=4),
+        }
+        if header is None:
+            self.result['diff'] = diff
+        else:
+            # Modules changing many objects return one diff per object
+            diff['before_header'] = diff['after_header'] = header
+            self.result.setdefault('diff', []).append(diff)
+
     def requestParse(self, request):
         try:
             message = \
@@ -53,4 +162,111 @@ class HarborBaseModule(object):
             f"HTTP status code: {request.status_code}\n" \
             f"Body: {request.text}"
 
-        return message
\ No newline at end of file
+        return message
+
+    def getPage(self, path, params, page, page_size):
+        page_request = requests.get(
+            f"{self.api_url}{path}",
+            auth=self.auth,
+            params=dict(params or {}, page=page, page_size=page_size)
+        )
+        if not page_request.status_code == 200:
+            raise HarborApiError(self.requestParse(page_request))
+
+        return page_request.json() or [], int(page_request.headers.get('X-Total-Count', 0))
+
+    def paginate(self, path, params=None, page_size=100):
+        # Yield items of a paginated list endpoint, holding one page in memory
+        page = 1
+        while True:
+            items, total = self.getPage(path, params, page, page_size)
+            for item in items:
+                yield item
+
+            if len(items) < page_size:
+                return
+            page += 1
+
+    def paginateReverse(self, path, params=None, page_size=100):
+        # Yield items from the last to the first. Deleting yielded items does
+        # not shift the pages still to come, unlike with paginate.
+        items, total = self.getPage(path, params, 1, page_size)
+        for page in range((total + page_size - 1) // page_size, 1, -1):
+            for item in reversed(self.getPage(path, params, page, page_size)[0]):
+                yield item
+
+        for item in reversed(items):
+            yield item
+
+    def repositoryPath(self, project_name, repository_name):
+        # API path of a repository, the name without project is double encoded
+        if repository_name.startswith(f"{project_name}/"):
+            repository_name = repository_name[len(project_name) + 1:]
+        return f"/projects/{project_name}/repositories/{quote(quote(repository_name, safe=''), safe='')}"
+
+    def listRepositories(self, project_name):
+        return self.paginate(f"/projects/{project_name}/repositories")
+
+    def listArtifacts(self, project_name, repository_name, params=None):
+        return self.paginate(
+            f"{self.repositoryPath(project_name, repository_name)}/artifacts",
+            params=params
+        )
+
+    def waitFor(self, check, timeout, message="Timeout", interval=2, max_interval=60):
+        # Call check with exponential backoff and jitter until it returns
+        # something else than None
+        deadline = time.monotonic() + timeout
+        while True:
+            value = check()
+            if value is not None:
+                return value
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise HarborApiError(message)
+
+            time.sleep(min(random.uniform(interval / 2, interval), remaining))
+            interval = min(interval * 2, max_interval)
+
+    def rateLimited(self, function, rate_limit):
+        # Wrap function so all threads together call it at most rate_limit times per second
+        lock = threading.Lock()
+        schedule = {"next": time.monotonic()}
+
+        def limited(item):
+            with lock:
+                now = time.monotonic()
+                delay = schedule['next'] - now
+                schedule['next'] = max(now, schedule['next']) + 1.0 / rate_limit
+            if delay > 0:
+                time.sleep(delay)
+            return function(item)
+
+        return limited
+
+    def runConcurrently(self, function, items, workers=4, rate_limit=None):
+        # Yield (item, result) of function(item) with at most `workers` calls
+        # in flight. Items are consumed lazily, so generators of any length
+        # are processed in constant memory. Exceptions are re-raised here.
+        if rate_limit:
+            function = self.rateLimited(function, rate_limit)
+
+        items = iter(items)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+            for item in items:
+                pending[executor.submit(function, item)] = item
+                if len(pending) >= workers:
+                    break
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    yield item, future.result()
+
+                for item in items:
+                    pending[executor.submit(function, item)] = item
+                    if len(pending) >= workers:
+                        break
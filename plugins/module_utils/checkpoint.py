@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+__metaclass__ = type
+
+class HarborCheckpoint(object):
+    # Progress of a bulk operation. With a path it is written to disk every
+    # `interval` seconds, so an interrupted run can resume and a run under
+    # async can be watched by reading the file.
+    #
+    # Completed keys are only remembered with a path and `keys`. Runs which
+    # delete what they process don't need them, deleted objects are gone
+    # from the next listing, only their count is carried over.
+    def __init__(self, path=None, total=None, interval=5, spec=None, keys=True):
+        self.path = path
+        self.total = total
+        self.interval = interval
+        self.keys = keys and path is not None
+        self.spec_hash = hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+        self.done = set()
+        self.pending = set()
+        self.completed = 0
+        self.processed = 0
+        self.started = time.monotonic()
+        self.saved = self.started
+        self.lock = threading.Lock()
+
+        state = self.load()
+        # A finished checkpoint belongs to the previous run, one of another
+        # spec would skip objects which now need other changes
+        if state and not state.get('finished') and state.get('spec') == self.spec_hash:
+            self.completed = state.get('completed') or 0
+            if self.keys:
+                self.done = set(state.get('done') or [])
+        self.resumed = self.completed
+
+    def load(self):
+        if self.path is None:
+            return None
+        try:
+            with open(self.path) as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            return None
+
+    def isDone(self, key):
+        return key in self.done
+
+    def setPending(self, keys):
+        if self.keys:
+            self.pending = set(key for key in keys if key not in self.done)
+
+    def markDone(self, key):
+        with self.lock:
+            if self.keys:
+                self.done.add(key)
+                self.pending.discard(key)
+            self.completed += 1
+            self.processed += 1
+            if self.path is not None and time.monotonic() - self.saved >= self.interval:
+                self.write(False)
+
+    def status(self, finished=False):
+        elapsed = time.monotonic() - self.started
+        status = {
+            "processed": self.processed,
+            "resumed": self.resumed,
+            "completed": self.completed,
+            "total": self.total,
+            "percent": None,
+            "throughput": round(self.processed / elapsed, 2) if elapsed > 0 else None,
+            "elapsed": int(elapsed),
+            "finished": finished
+        }
+        if self.total:
+            status['percent'] = round(min(self.completed, self.total) * 100 / self.total, 1)
+        return status
+
+    def write(self, finished):
+        state = self.status(finished)
+        state['spec'] = self.spec_hash
+        if self.keys:
+            state['done'] = list(self.done)
+            state['pending'] = list(self.pending)
+
+        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), prefix=".checkpoint")
+        try:
+            with os.fdopen(temp_fd, 'w') as temp_file:
+                json.dump(state, temp_file, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.saved = time.monotonic()
+
+    def save(self):
+        # Keep the progress of an interrupted run to resume from
+        with self.lock:
+            if self.path is not None:
+                self.write(False)
+            return self.status()
+
+    def finish(self):
+        with self.lock:
+            if self.path is not None:
+                self.write(True)
+            return self.status(True)
@@ -0,0 +1,27 @@
+__metaclass__ = type
+
+def computePatch(desired, actual):
+    # Minimal patch turning actual into desired: only keys of desired whose
+    # value differs. Nested dicts are compared key by key, without copies.
+    patch = {}
+    for key, value in desired.items():
+        if not isinstance(actual, dict) or key not in actual:
+            patch[key] = value
+        elif isinstance(value, dict) and isinstance(actual[key], dict):
+            nested = computePatch(value, actual[key])
+            if nested:
+                patch[key] = nested
+        elif value != actual[key]:
+            patch[key] = value
+    return patch
+
+def selectPaths(patch, actual):
+    # Values of actual at the paths of patch, the "before" side of a patch
+    selected = {}
+    for key, value in patch.items():
+        current = actual.get(key) if isinstance(actual, dict) else None
+        if isinstance(value, dict) and isinstance(current, dict):
+            selected[key] = selectPaths(value, current)
+        else:
+            selected[key] = current
+    return selected
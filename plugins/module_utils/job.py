@@ -0,0 +1,213 @@
+import re
+import time
+from datetime import datetime
+
+import requests
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+
+__metaclass__ = type
+
+class HarborJobBaseModule(HarborBaseModule):
+    # Maintenance jobs which Harbor runs through the jobservice
+    JOBS = {
+        'gc': {
+            'schedule': '/system/gc/schedule',
+            'executions': '/system/gc',
+        },
+        'purgeaudit': {
+            'schedule': '/system/purgeaudit/schedule',
+            'executions': '/system/purgeaudit',
+        },
+        'scan_all': {
+            'schedule': '/system/scanAll/schedule',
+            'metrics': '/scans/all/metrics',
+        },
+    }
+
+    RUN_ARG_SPEC = dict(
+        run_now=dict(type='bool', required=False, default=False),
+        wait=dict(type='bool', required=False, default=True),
+        wait_timeout=dict(type='int', required=False, default=3600)
+    )
+
+    RUN_CONTROL_OPTIONS = HarborBaseModule.RUN_CONTROL_OPTIONS + list(RUN_ARG_SPEC)
+
+    FINAL_STATUSES = ['Success', 'Error', 'Stopped']
+
+    # Scan all has no execution to poll, metrics may still show the previous
+    # run until the new one started
+    SCAN_ALL_START_GRACE = 30
+
+    GC_FREED_PATTERN = re.compile(r"free(?:s)? up (\d+) MB")
+    GC_DELETED_PATTERN = re.compile(r"(\d+) blobs and (\d+) manifests")
+
+    def listExecutions(self, job, since=None):
+        # Stream executions newest first, stop at the first one older than `since`
+        executions = self.paginate(
+            self.JOBS[job]['executions'],
+            params={"sort": "-creation_time"}
+        )
+        for execution in executions:
+            if since is not None and self.parseTime(execution['creation_time']) < since:
+                return
+            yield execution
+
+    def triggerExecution(self, job, parameters=None):
+        # Run the job once now, Harbor returns the execution in the location header
+        payload = {
+            "schedule": {
+                "type": "Manual"
+            }
+        }
+        if parameters is not None:
+            payload['parameters'] = parameters
+
+        trigger_request = requests.post(
+            f"{self.api_url}{self.JOBS[job]['schedule']}",
+            auth=self.auth,
+            json=payload
+        )
+        if not trigger_request.status_code == 201:
+            raise HarborApiError(self.requestParse(trigger_request))
+
+        if 'executions' not in self.JOBS[job]:
+            return None
+
+        return int(trigger_request.headers['Location'].rstrip("/").rsplit("/", 1)[1])
+
+    def getJobStatus(self, job, execution_id):
+        # Status and optional progress details of a triggered job
+        if job == 'scan_all':
+            metrics = self.getScanAllMetrics()
+            details = {
+                "total": metrics.get('total'),
+                "completed": metrics.get('completed')
+            }
+            if metrics.get('ongoing'):
+                return 'Running', details
+            if (metrics.get('metrics') or {}).get('Error'):
+                return 'Error', details
+            return 'Success', details
+
+        return self.getExecution(job, execution_id)['job_status'], None
+
+    def waitForJob(self, job, execution_id, timeout):
+        # Poll until the job reached a final status. Status changes are
+        # appended to result['progress'] as [elapsed seconds, status, details].
+        started = time.monotonic()
+        progress = self.result.setdefault('progress', [])
+        state = {
+            "last": None,
+            "running_seen": False
+        }
+
+        def check():
+            status, details = self.getJobStatus(job, execution_id)
+            elapsed = int(time.monotonic() - started)
+            if [status, details] != state['last']:
+                progress.append([elapsed, status, details])
+                state['last'] = [status, details]
+
+            if status not in self.FINAL_STATUSES:
+                state['running_seen'] = True
+            elif job != 'scan_all' or state['running_seen'] or elapsed >= self.SCAN_ALL_START_GRACE:
+                return status
+
+            return None
+
+        return self.waitFor(
+            check,
+            timeout,
+            f"Timeout waiting for {job} execution {execution_id}"
+        )
+
+    def runJob(self, job, parameters=None, timeout=3600, wait=True):
+        # Trigger a job and optionally block until it finished
+        started = time.monotonic()
+        run = {
+            "job": job,
+            "id": self.triggerExecution(job, parameters),
+            "status": "Pending",
+            "started": datetime.utcnow().strftime(self.TIME_FORMAT),
+            "duration": None
+        }
+        if wait:
+            run['status'] = self.waitForJob(job, run['id'], timeout)
+            run['duration'] = int(time.monotonic() - started)
+
+        return run
+
+    def runNow(self, job, parameters=None):
+        # Shared handling of the `run_now` option, sets result['run']
+        if self.module.check_mode:
+            return None
+
+        try:
+            run = self.runJob(job, parameters, self.module.params['wait_timeout'], self.module.params['wait'])
+        except HarborApiError as e:
+            self.module.fail_json(msg=str(e), **self.result)
+
+        self.result['run'] = run
+        if run['status'] not in ['Success', 'Pending']:
+            self.module.fail_json(msg=f"Job {job} finished with status {run['status']}", **self.result)
+
+        return run
+
+    def getExecution(self, job, execution_id):
+        execution_request = requests.get(
+            f"{self.api_url}{self.JOBS[job]['executions']}/{execution_id}",
+            auth=self.auth
+        )
+        if not execution_request.status_code == 200:
+            raise HarborApiError(self.requestParse(execution_request))
+
+        return execution_request.json()
+
+    def getExecutionLog(self, job, execution_id):
+        log_request = requests.get(
+            f"{self.api_url}{self.JOBS[job]['executions']}/{execution_id}/log",
+            auth=self.auth
+        )
+        if not log_request.status_code == 200:
+            raise HarborApiError(self.requestParse(log_request))
+
+        return log_request.text
+
+    def getScanAllMetrics(self):
+        metrics_request = requests.get(
+            f"{self.api_url}{self.JOBS['scan_all']['metrics']}",
+            auth=self.auth
+        )
+        if not metrics_request.status_code == 200:
+            raise HarborApiError(self.requestParse(metrics_request))
+
+        return metrics_request.json()
+
+    def executionDuration(self, execution):
+        # Seconds between creation and last update, None while still running
+        if execution['job_status'] not in self.FINAL_STATUSES:
+            return None
+
+        start = self.parseTime(execution['creation_time'])
+        end = self.parseTime(execution['update_time'])
+        return int((end - start).total_seconds())
+
+    def parseGcLog(self, log):
+        # Harbor logs freed space in MB, the last matching line is the summary
+        summary = {
+            "freed_bytes": None,
+            "blobs": None,
+            "manifests": None
+        }
+        for line in log.splitlines():
+            freed = self.GC_FREED_PATTERN.search(line)
+            if freed:
+                summary['freed_bytes'] = int(freed.group(1)) * 1024 * 1024
+
+            deleted = self.GC_DELETED_PATTERN.search(line)
+            if deleted:
+                summary['blobs'] = int(deleted.group(1))
+                summary['manifests'] = int(deleted.group(2))
+
+        return summary
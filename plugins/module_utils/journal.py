@@ -0,0 +1,59 @@
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+__metaclass__ = type
+
+class HarborJournal(object):
+    # Local record of the last applied desired state per Harbor object:
+    # {key: {"hash": sha256 of the desired spec, "verified": epoch seconds}}
+    def __init__(self, path, api_url):
+        self.path = path
+        self.api_url = api_url
+
+    def key(self, kind, identity):
+        return f"{self.api_url}|{kind}|{identity}"
+
+    def specHash(self, spec):
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def load(self):
+        try:
+            with open(self.path) as journal_file:
+                return json.load(journal_file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            # A broken journal only costs a full verification
+            return {}
+
+    def isFresh(self, key, spec_hash, ttl):
+        entry = self.load().get(key)
+        if entry is None or entry.get('hash') != spec_hash:
+            return False
+        return time.time() - entry.get('verified', 0) < ttl
+
+    def record(self, key, spec_hash):
+        # Parallel forks share the journal: lock, re-read, replace atomically
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                entries = self.load()
+                entries[key] = {
+                    "hash": spec_hash,
+                    "verified": time.time()
+                }
+                temp_fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".journal")
+                try:
+                    with os.fdopen(temp_fd, 'w') as temp_file:
+                        json.dump(entries, temp_file, sort_keys=True)
+                    os.replace(temp_path, self.path)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
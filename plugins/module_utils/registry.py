@@ -0,0 +1,143 @@
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError
+
+__metaclass__ = type
+
+class HarborRegistryClient(object):
+    # Minimal client of the Docker registry v2 API served by Harbor
+    MANIFEST_TYPES = [
+        'application/vnd.oci.image.index.v1+json',
+        'application/vnd.oci.image.manifest.v1+json',
+        'application/vnd.docker.distribution.manifest.list.v2+json',
+        'application/vnd.docker.distribution.manifest.v2+json',
+    ]
+    INDEX_TYPES = [
+        'application/vnd.oci.image.index.v1+json',
+        'application/vnd.docker.distribution.manifest.list.v2+json',
+    ]
+    CHALLENGE_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+    # Lifetime the token spec assumes without expires_in, and the margin a
+    # token is renewed before it expires
+    TOKEN_DEFAULT_EXPIRY = 60
+    TOKEN_RENEW_MARGIN = 30
+
+    def __init__(self, api_url, auth, registry_url=None):
+        if registry_url is None:
+            parsed = urlparse(api_url)
+            registry_url = f"{parsed.scheme}://{parsed.netloc}"
+        self.registry_url = registry_url.rstrip("/")
+        self.auth = auth
+        self.tokens = {}
+        self.lock = threading.Lock()
+        self.challenge = None
+
+    def parseReference(self, image):
+        # `project/repo:tag` or `project/repo@sha256:...`, tag defaults to latest
+        if "@" in image:
+            repository, reference = image.split("@", 1)
+        elif ":" in image.rsplit("/", 1)[-1]:
+            repository, reference = image.rsplit(":", 1)
+        else:
+            repository, reference = image, "latest"
+        return repository, reference
+
+    def getChallenge(self):
+        # Token service announced by the registry, None if basic auth is accepted
+        with self.lock:
+            if self.challenge is None:
+                ping_request = requests.get(f"{self.registry_url}/v2/", auth=self.auth)
+                header = ping_request.headers.get('WWW-Authenticate', '')
+                if ping_request.status_code == 401 and header.lower().startswith('bearer'):
+                    self.challenge = dict(self.CHALLENGE_PATTERN.findall(header))
+                else:
+                    self.challenge = {}
+            return self.challenge
+
+    def headers(self, repository):
+        challenge = self.getChallenge()
+        if not challenge:
+            return {}
+
+        with self.lock:
+            token, expires = self.tokens.get(repository, (None, 0))
+        if token is None or time.monotonic() >= expires:
+            requested = time.monotonic()
+            token_request = requests.get(
+                challenge['realm'],
+                auth=self.auth,
+                params={
+                    "service": challenge.get('service', ''),
+                    "scope": f"repository:{repository}:pull"
+                }
+            )
+            if not token_request.status_code == 200:
+                raise HarborApiError(f"Token request for {repository} failed with HTTP status code {token_request.status_code}")
+            response = token_request.json()
+            token = response.get('token') or response.get('access_token')
+            expires_in = response.get('expires_in') or self.TOKEN_DEFAULT_EXPIRY
+            expires = requested + max(expires_in - self.TOKEN_RENEW_MARGIN, expires_in / 2)
+            with self.lock:
+                self.tokens[repository] = (token, expires)
+
+        return {"Authorization": f"Bearer {token}"}
+
+    def dropToken(self, repository):
+        with self.lock:
+            self.tokens.pop(repository, None)
+
+    def request(self, method, repository, path, retry=True, **kwargs):
+        extra_headers = kwargs.pop('headers', {})
+        headers = dict(extra_headers, **self.headers(repository))
+        auth = None if 'Authorization' in headers else self.auth
+        response = requests.request(
+            method,
+            f"{self.registry_url}/v2/{repository}/{path}",
+            auth=auth,
+            headers=headers,
+            **kwargs
+        )
+        # The token expired or was revoked before its expiry, request a new one once
+        if response.status_code == 401 and auth is None and retry:
+            response.close()
+            self.dropToken(repository)
+            return self.request(method, repository, path, retry=False, headers=extra_headers, **kwargs)
+        return response
+
+    def getManifest(self, repository, reference):
+        manifest_request = self.request(
+            'GET',
+            repository,
+            f"manifests/{reference}",
+            headers={"Accept": ", ".join(self.MANIFEST_TYPES)}
+        )
+        if not manifest_request.status_code == 200:
+            raise HarborApiError(f"Manifest {repository}:{reference} HTTP status code {manifest_request.status_code}")
+
+        manifest = manifest_request.json()
+        manifest.setdefault('mediaType', manifest_request.headers.get('Content-Type', '').split(";")[0])
+        return manifest
+
+    def blobSizes(self, manifest):
+        # Config and layer digests of an image manifest with their sizes
+        sizes = {}
+        if manifest.get('config'):
+            sizes[manifest['config']['digest']] = manifest['config'].get('size') or 0
+        for layer in manifest.get('layers') or []:
+            sizes[layer['digest']] = layer.get('size') or 0
+        return sizes
+
+    def readBlob(self, repository, digest, chunk_size=1024 * 1024):
+        # Stream the blob without keeping it, returns the number of bytes read
+        size = 0
+        with self.request('GET', repository, f"blobs/{digest}", stream=True) as blob_request:
+            if not blob_request.status_code == 200:
+                raise HarborApiError(f"Blob {repository}@{digest} HTTP status code {blob_request.status_code}")
+            for chunk in blob_request.iter_content(chunk_size):
+                size += len(chunk)
+        return size
@@ -0,0 +1,278 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_access_report
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Report the roles of all users and groups on Harbor projects
+description:
+  - Read the members of all projects in parallel over API and index them by user and group.
+  - The index is written to `dest` as JSON lines (one line per principal) or CSV (one row per membership), or returned as `access`.
+  - Differences to a desired access matrix are returned in `drift`.
+options:
+  projects:
+    description:
+    - Names of the projects to report. All projects are reported if not set.
+    required: false
+    type: list
+    elements: str
+  dest:
+    description:
+    - Path of the report file. The index is returned in `access` if not set.
+    required: false
+    type: path
+  format:
+    description:
+    - Format of the report file.
+    required: false
+    type: str
+    choices: ['jsonl', 'csv']
+    default: 'jsonl'
+  desired:
+    description:
+    - Desired memberships of the reported projects.
+    - Memberships missing, with another role or not in this list are reported in `drift`.
+    required: false
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+        - Name of the user or group.
+        required: true
+        type: str
+      type:
+        description:
+        - Type of the principal.
+        required: false
+        type: str
+        choices: ['user', 'group']
+        default: 'user'
+      project:
+        description:
+        - Name of the project.
+        required: true
+        type: str
+      role:
+        description:
+        - Role on the project.
+        required: true
+        type: str
+        choices: ['projectAdmin', 'maintainer', 'developer', 'guest', 'limitedGuest']
+  fail_on_drift:
+    description:
+    - Fail if the members differ from `desired`.
+    required: false
+    type: bool
+    default: false
+  workers:
+    description:
+    - Number of projects read in parallel.
+    required: false
+    type: int
+    default: 8
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import copy
+import csv
+import filecmp
+import json
+import os
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+
+
+class HarborAccessReportModule(HarborBaseModule):
+    ROLES = {
+        1: 'projectAdmin',
+        2: 'developer',
+        3: 'guest',
+        4: 'maintainer',
+        5: 'limitedGuest'
+    }
+
+    ENTITY_TYPES = {
+        'u': 'user',
+        'g': 'group'
+    }
+
+    def listProjects(self):
+        names = self.module.params['projects']
+        for project in self.paginate("/projects"):
+            if names is None or project['name'] in names:
+                yield project
+
+    def listMembers(self, project):
+        # Only what the index needs, the project name is added by the caller
+        return [
+            (self.ENTITY_TYPES.get(member['entity_type'], member['entity_type']), member['entity_name'], member['role_id'])
+            for member in self.paginate(f"/projects/{project['project_id']}/members")
+        ]
+
+    def writeReport(self, access):
+        # Written next to dest first, replaces dest only if the content changed
+        dest = self.module.params['dest']
+        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dest)), prefix=".access")
+        try:
+            with os.fdopen(temp_fd, 'w', newline='') as temp_file:
+                if self.module.params['format'] == 'csv':
+                    writer = csv.writer(temp_file)
+                    writer.writerow(['type', 'name', 'project', 'role'])
+                    for (principal_type, name), projects in sorted(access.items()):
+                        for project_name, role_id in sorted(projects.items()):
+                            writer.writerow([principal_type, name, project_name, self.ROLES.get(role_id, role_id)])
+                else:
+                    for (principal_type, name), projects in sorted(access.items()):
+                        temp_file.write(json.dumps({
+                            "type": principal_type,
+                            "name": name,
+                            "projects": {
+                                project_name: self.ROLES.get(role_id, role_id)
+                                for project_name, role_id in sorted(projects.items())
+                            }
+                        }) + "\n")
+
+            if os.path.exists(dest) and filecmp.cmp(temp_path, dest, shallow=False):
+                os.unlink(temp_path)
+                return False
+            os.replace(temp_path, dest)
+            return True
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def findDrift(self, access, reported_projects):
+        drift = {
+            "missing": [],
+            "different_role": [],
+            "unexpected": []
+        }
+        desired = {}
+        for membership in self.module.params['desired']:
+            desired[(membership['type'], membership['name'], membership['project'])] = membership['role']
+
+        for (principal_type, name, project_name), role in desired.items():
+            actual = access.get((principal_type, name), {}).get(project_name)
+            entry = {"type": principal_type, "name": name, "project": project_name, "role": role}
+            if actual is None:
+                drift['missing'].append(entry)
+            elif self.ROLES.get(actual) != role:
+                drift['different_role'].append(dict(entry, actual_role=self.ROLES.get(actual, actual)))
+
+        for (principal_type, name), projects in access.items():
+            for project_name, role_id in projects.items():
+                if project_name in reported_projects and (principal_type, name, project_name) not in desired:
+                    drift['unexpected'].append({
+                        "type": principal_type,
+                        "name": name,
+                        "project": project_name,
+                        "role": self.ROLES.get(role_id, role_id)
+                    })
+
+        for entries in drift.values():
+            entries.sort(key=lambda entry: (entry['type'], entry['name'], entry['project']))
+        return drift
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            projects=dict(type='list', elements='str', required=False),
+            dest=dict(type='path', required=False),
+            format=dict(type='str', required=False, default='jsonl', choices=['jsonl', 'csv']),
+            desired=dict(
+                type='list',
+                elements='dict',
+                required=False,
+                options=dict(
+                    name=dict(type='str', required=True),
+                    type=dict(type='str', required=False, default='user', choices=['user', 'group']),
+                    project=dict(type='str', required=True),
+                    role=dict(
+                        type='str',
+                        required=True,
+                        choices=['projectAdmin', 'maintainer', 'developer', 'guest', 'limitedGuest']
+                    ),
+                )
+            ),
+            fail_on_drift=dict(type='bool', required=False, default=False),
+            workers=dict(type='int', required=False, default=8),
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            projects=0,
+            principals=0,
+            memberships=0
+        )
+
+        # (type, name) -> {project name: role ID}
+        access = {}
+        reported_projects = set()
+        try:
+            results = self.runConcurrently(self.listMembers, self.listProjects(), self.module.params['workers'])
+            for project, members in results:
+                reported_projects.add(project['name'])
+                for principal_type, name, role_id in members:
+                    access.setdefault((principal_type, name), {})[project['name']] = role_id
+
+        except HarborApiError as e:
+            self.module.fail_json(msg=str(e), **self.result)
+
+        self.result['projects'] = len(reported_projects)
+        self.result['principals'] = len(access)
+        self.result['memberships'] = sum(len(projects) for projects in access.values())
+
+        if self.module.params['dest'] is None:
+            self.result['access'] = [
+                {
+                    "type": principal_type,
+                    "name": name,
+                    "projects": {
+                        project_name: self.ROLES.get(role_id, role_id)
+                        for project_name, role_id in sorted(projects.items())
+                    }
+                }
+                for (principal_type, name), projects in sorted(access.items())
+            ]
+        elif not self.module.check_mode:
+            try:
+                self.result['changed'] = self.writeReport(access)
+            except OSError as e:
+                self.module.fail_json(msg=f"Could not write report: {e}", **self.result)
+
+        if self.module.params['desired'] is not None:
+            self.result['drift'] = self.findDrift(access, reported_projects)
+            drifted = any(self.result['drift'].values())
+            if drifted and self.module.params['fail_on_drift']:
+                self.module.fail_json(msg="Project members differ from the desired access", **self.result)
+
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborAccessReportModule()
+
+if __name__ == '__main__':
+    main()
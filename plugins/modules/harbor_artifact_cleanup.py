@@ -0,0 +1,232 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_artifact_cleanup
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Delete old Harbor artifacts
+description:
+  - Delete artifacts of given projects over API by keep last, age and tag rules.
+  - Repositories and artifacts are streamed, memory usage does not depend on the repository size.
+  - Reclaimed bytes are the sum of the deleted artifact sizes. Storage is only freed by the next garbage collection,
+    blobs shared with other artifacts are not freed at all.
+options:
+  projects:
+    description:
+    - Names of projects to clean up.
+    required: true
+    type: list
+    elements: str
+  repository_regex:
+    description:
+    - Only clean up repositories whose name (without project) matches.
+    required: false
+    type: str
+  keep_last:
+    description:
+    - Number of most recently pushed matching artifacts kept per repository.
+    required: false
+    type: int
+    default: 10
+  older_than_days:
+    description:
+    - Only delete artifacts pushed more than this many days ago.
+    required: false
+    type: int
+  tag_regex:
+    description:
+    - Delete tagged artifacts whose tags all match.
+    - Tagged artifacts are kept if not set.
+    required: false
+    type: str
+  untagged:
+    description:
+    - Delete untagged artifacts.
+    required: false
+    type: bool
+    default: true
+  workers:
+    description:
+    - Number of parallel delete requests.
+    required: false
+    type: int
+    default: 4
+  rate_limit:
+    description:
+    - Maximum delete requests per second.
+    required: false
+    type: float
+  report_limit:
+    description:
+    - Maximum number of deleted artifacts listed in the result.
+    required: false
+    type: int
+    default: 100
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+  - swisstxt.harbor.checkpoint
+'''
+
+import copy
+import re
+from datetime import datetime, timedelta
+
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+
+
+class HarborArtifactCleanupModule(HarborBaseModule):
+    RUN_CONTROL_OPTIONS = HarborBaseModule.RUN_CONTROL_OPTIONS + ['workers', 'rate_limit', 'report_limit']
+
+    def isCandidate(self, artifact):
+        tags = [tag['name'] for tag in artifact.get('tags') or []]
+        if not tags:
+            return self.module.params['untagged']
+
+        if self.tag_regex is None:
+            return False
+        return all(self.tag_regex.fullmatch(tag) for tag in tags)
+
+    def selectArtifacts(self, oldest):
+        for project_name in self.module.params['projects']:
+            # Harbor removes repositories whose last artifact got deleted
+            for repository in self.paginateReverse(f"/projects/{project_name}/repositories"):
+                repository_name = repository['name'][len(project_name) + 1:]
+                if self.repository_regex is not None and not self.repository_regex.fullmatch(repository_name):
+                    continue
+
+                # Newest first, so keep_last only needs a counter. Walking
+                # oldest first pages backwards keeps pagination stable while
+                # artifacts get deleted.
+                artifacts = self.paginateReverse(
+                    f"{self.repositoryPath(project_name, repository['name'])}/artifacts",
+                    params={
+                        "sort": "push_time",
+                        "with_tag": "true"
+                    }
+                )
+                kept = 0
+                for artifact in artifacts:
+                    if not self.isCandidate(artifact):
+                        continue
+
+                    if kept < self.module.params['keep_last']:
+                        kept += 1
+                        continue
+
+                    if oldest is not None and self.parseTime(artifact['push_time']) >= oldest:
+                        continue
+
+                    yield {
+                        "project": project_name,
+                        "repository": repository['name'],
+                        "digest": artifact['digest'],
+                        "tags": [tag['name'] for tag in artifact.get('tags') or []],
+                        "size": artifact.get('size', 0)
+                    }
+
+    def deleteArtifact(self, artifact):
+        delete_request = requests.delete(
+            f"{self.api_url}{self.repositoryPath(artifact['project'], artifact['repository'])}/artifacts/{artifact['digest']}",
+            auth=self.auth
+        )
+        # Already deleted, e.g. by a concurrent run
+        if delete_request.status_code == 404:
+            return False
+        if not delete_request.status_code == 200:
+            raise HarborApiError(self.requestParse(delete_request))
+
+        return True
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            projects=dict(type='list', elements='str', required=True),
+            repository_regex=dict(type='str', required=False),
+            keep_last=dict(type='int', required=False, default=10),
+            older_than_days=dict(type='int', required=False),
+            tag_regex=dict(type='str', required=False),
+            untagged=dict(type='bool', required=False, default=True),
+            workers=dict(type='int', required=False, default=4),
+            rate_limit=dict(type='float', required=False),
+            report_limit=dict(type='int', required=False, default=100),
+        )
+        argument_spec.update(self.CHECKPOINT_ARG_SPEC)
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            deleted=0,
+            reclaimed_bytes=0,
+            artifacts=[]
+        )
+
+        try:
+            self.repository_regex = None
+            if self.module.params['repository_regex'] is not None:
+                self.repository_regex = re.compile(self.module.params['repository_regex'])
+            self.tag_regex = None
+            if self.module.params['tag_regex'] is not None:
+                self.tag_regex = re.compile(self.module.params['tag_regex'])
+        except re.error as e:
+            self.module.fail_json(msg=f"Invalid regex: {e}", **self.result)
+
+        oldest = None
+        if self.module.params['older_than_days'] is not None:
+            oldest = datetime.utcnow() - timedelta(days=self.module.params['older_than_days'])
+
+        checkpoint = self.openCheckpoint(keys=False)
+        try:
+            # Deleted artifacts are not selected again, a resumed run only
+            # carries over the count
+            artifacts = self.selectArtifacts(oldest)
+            if self.module.check_mode:
+                deletions = ((artifact, True) for artifact in artifacts)
+            else:
+                deletions = self.runConcurrently(
+                    self.deleteArtifact,
+                    artifacts,
+                    self.module.params['workers'],
+                    self.module.params['rate_limit']
+                )
+
+            for artifact, deleted in deletions:
+                checkpoint.markDone(f"{artifact['repository']}@{artifact['digest']}")
+                if not deleted:
+                    continue
+                self.result['deleted'] += 1
+                self.result['reclaimed_bytes'] += artifact['size']
+                if len(self.result['artifacts']) < self.module.params['report_limit']:
+                    self.result['artifacts'].append(artifact)
+
+        except HarborApiError as e:
+            self.result['progress'] = checkpoint.save()
+            self.module.fail_json(msg=str(e), **self.result)
+
+        self.result['progress'] = checkpoint.finish()
+        self.result['changed'] = self.result['deleted'] > 0
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborArtifactCleanupModule()
+
+if __name__ == '__main__':
+    main()
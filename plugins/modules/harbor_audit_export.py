@@ -0,0 +1,232 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_audit_export
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Export Harbor audit logs
+description:
+  - Export Harbor audit logs over API to a JSON lines file before they get purged.
+  - Logs are streamed page by page to disk, memory usage does not depend on the amount of logs.
+  - A cursor file remembers the last exported log so following runs only export new logs.
+options:
+  dest:
+    description:
+    - Path of the JSON lines file. New logs are appended.
+    required: true
+    type: path
+  compress:
+    description:
+    - Write gzip compressed output.
+    required: false
+    type: bool
+    default: false
+  cursor_file:
+    description:
+    - Path of the resume cursor. Defaults to `dest` with a `.cursor` suffix.
+    required: false
+    type: path
+  start_time:
+    description:
+    - Start of the time window (UTC, `YYYY-MM-DD HH:MM:SS`) if no cursor exists yet.
+    required: false
+    type: str
+  end_time:
+    description:
+    - End of the time window (UTC, `YYYY-MM-DD HH:MM:SS`). Defaults to now.
+    required: false
+    type: str
+  workers:
+    description:
+    - Split the time window in this many parts, exported in parallel. Useful for large backfills.
+    required: false
+    type: int
+    default: 1
+  page_size:
+    description:
+    - Number of audit logs requested per API call.
+    required: false
+    type: int
+    default: 100
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import copy
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+
+
+class HarborAuditExportModule(HarborBaseModule):
+    def readCursor(self):
+        try:
+            with open(self.cursor_file) as cursor_file:
+                cursor = json.load(cursor_file)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            self.module.fail_json(msg=f"Cursor file {self.cursor_file} is corrupt", **self.result)
+
+        return (self.parseTime(cursor['op_time']), cursor['id'])
+
+    def writeCursor(self, cursor):
+        tmp_path = f"{self.cursor_file}.tmp"
+        with open(tmp_path, 'w') as cursor_file:
+            json.dump({
+                "op_time": cursor[0].strftime(self.TIME_FORMAT),
+                "id": cursor[1]
+            }, cursor_file)
+        os.replace(tmp_path, self.cursor_file)
+
+    def splitWindow(self, start, end, parts):
+        # Inclusive, non-overlapping windows with second granularity
+        total_seconds = int((end - start).total_seconds()) + 1
+        parts = max(1, min(parts, total_seconds))
+        step = total_seconds // parts
+        windows = []
+        for index in range(parts):
+            window_start = start + timedelta(seconds=index * step)
+            if index == parts - 1:
+                window_end = end
+            else:
+                window_end = window_start + timedelta(seconds=step - 1)
+            windows.append((index, window_start, window_end))
+        return windows
+
+    def exportWindow(self, window):
+        index, start, end = window
+        part_path = f"{self.dest}.part{index}"
+        opener = gzip.open if self.module.params['compress'] else open
+
+        count = 0
+        last = None
+        with opener(part_path, 'wt') as part_file:
+            logs = self.paginate(
+                "/audit-logs",
+                params={
+                    "q": f"op_time=[{start.strftime(self.TIME_FORMAT)}~{end.strftime(self.TIME_FORMAT)}]",
+                    "sort": "op_time,id"
+                },
+                page_size=self.module.params['page_size']
+            )
+            for log in logs:
+                key = (self.parseTime(log['op_time']), log['id'])
+                # Logs of the cursor second may already be exported
+                if self.cursor is not None and key <= self.cursor:
+                    continue
+                part_file.write(json.dumps(log) + "\n")
+                count += 1
+                if last is None or key > last:
+                    last = key
+
+        return part_path, count, last
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            dest=dict(type='path', required=True),
+            compress=dict(type='bool', required=False, default=False),
+            cursor_file=dict(type='path', required=False),
+            start_time=dict(type='str', required=False),
+            end_time=dict(type='str', required=False),
+            workers=dict(type='int', required=False, default=1),
+            page_size=dict(type='int', required=False, default=100),
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            records=0
+        )
+
+        self.dest = self.module.params['dest']
+        self.cursor_file = self.module.params['cursor_file'] or f"{self.dest}.cursor"
+        self.cursor = self.readCursor()
+
+        try:
+            if self.cursor is not None:
+                start = self.cursor[0]
+            elif self.module.params['start_time'] is not None:
+                start = self.parseTime(self.module.params['start_time'])
+            else:
+                start = datetime(1970, 1, 1)
+
+            if self.module.params['end_time'] is not None:
+                end = self.parseTime(self.module.params['end_time'])
+            else:
+                end = datetime.utcnow().replace(microsecond=0)
+        except ValueError as e:
+            self.module.fail_json(msg=f"Invalid time: {e}", **self.result)
+
+        self.result['window'] = {
+            "start": start.strftime(self.TIME_FORMAT),
+            "end": end.strftime(self.TIME_FORMAT)
+        }
+
+        if start > end or self.module.check_mode:
+            self.module.exit_json(**self.result)
+
+        windows = self.splitWindow(start, end, self.module.params['workers'])
+        parts = {}
+        cursor = self.cursor
+        try:
+            for window, (part_path, count, last) in self.runConcurrently(self.exportWindow, windows, self.module.params['workers']):
+                parts[window[0]] = part_path
+                self.result['records'] += count
+                if last is not None and (cursor is None or last > cursor):
+                    cursor = last
+
+            # Only complete windows are appended, in chronological order
+            with open(self.dest, 'ab') as dest_file:
+                for index in sorted(parts):
+                    with open(parts[index], 'rb') as part_file:
+                        shutil.copyfileobj(part_file, dest_file)
+
+        except HarborApiError as e:
+            self.module.fail_json(msg=str(e), **self.result)
+
+        finally:
+            for index, window_start, window_end in windows:
+                try:
+                    os.remove(f"{self.dest}.part{index}")
+                except FileNotFoundError:
+                    pass
+
+        if cursor is not None:
+            self.writeCursor(cursor)
+            self.result['cursor'] = {
+                "op_time": cursor[0].strftime(self.TIME_FORMAT),
+                "id": cursor[1]
+            }
+
+        self.result['changed'] = self.result['records'] > 0
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborAuditExportModule()
+
+if __name__ == '__main__':
+    main()
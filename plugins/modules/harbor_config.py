@@ -1,6 +1,6 @@
 import copy
 from ansible_collections.swisstxt.harbor.plugins.module_utils.base import HarborBaseModule
-import json
+from ansible_collections.swisstxt.harbor.plugins.module_utils.diff import computePatch, selectPaths
 import requests
 from ansible.module_utils.basic import AnsibleModule
 
@@ -27,6 +27,8 @@ extends_documentation_fragment:
 '''
 
 class HarborConfigModule(HarborBaseModule):
+    SECRET_OPTIONS = ['oidc_client_secret']
+
     @property
     def argspec(self):
         argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
@@ -45,7 +47,7 @@ class HarborConfigModule(HarborBaseModule):
 
         super().__init__()
 
-        result = dict(
+        self.result = dict(
             changed=False
         )
 
@@ -55,63 +57,67 @@ class HarborConfigModule(HarborBaseModule):
             auth=self.auth
         )
         before = before_request.json()
-        result['configuration'] = before.copy()
+        self.result['configuration'] = before
 
         # Check & "calculate" desired configuration
         desired_configuration = self.module.params['configuration']
         if desired_configuration:
-            after_calculated = before.copy()
-            for configuration in list(desired_configuration):
-                if not configuration == "oidc_client_secret":
-                    # Check if configuration option is available
-                    if configuration not in before:
-                        self.module.fail_json(msg=f"Configuration option {configuration} unavailable.", **result)
-
-                    # Remove not changed configurations
-                    if desired_configuration[configuration] == before[configuration].get('value', ''):
-                        desired_configuration.pop(configuration)
-                        continue
-
-                    # Check if configuration is editable
-                    if not before[configuration]['editable']:
-                        self.module.fail_json(msg=f"Configuration option {configuration} not editable.", **result)
-
-                    # Create fake server response for diff
-                    after_calculated.update({
-                        configuration: {
-                            "value": desired_configuration[configuration],
-                            "editable": before[configuration]['editable']
-                        }
-                    })
-
-            result['desired_configuration'] = desired_configuration
-            if (not self.module.params['force']) and before == after_calculated:
-                result['changed'] = False
-                self.module.exit_json(**result)
+            # Secrets are not returned by the API and always sent along
+            secrets = {}
+            current = {}
+            for configuration in desired_configuration:
+                if configuration in self.SECRET_OPTIONS:
+                    secrets[configuration] = desired_configuration[configuration]
+                    continue
+
+                # Check if configuration option is available
+                if configuration not in before:
+                    self.module.fail_json(msg=f"Configuration option {configuration} unavailable.", **self.result)
+                current[configuration] = before[configuration].get('value', '')
+
+            changes = computePatch(
+                {key: value for key, value in desired_configuration.items() if key not in secrets},
+                current
+            )
+
+            # Check if changed configurations are editable
+            for configuration in changes:
+                if not before[configuration]['editable']:
+                    self.module.fail_json(msg=f"Configuration option {configuration} not editable.", **self.result)
+
+            self.result['desired_configuration'] = dict(changes, **secrets)
+            if (not self.module.params['force']) and not changes:
+                self.module.exit_json(**self.result)
 
             # Test change with checkmode
             if self.module.check_mode:
-                result['changed'] = True
-                result['diff'] = {
-                    "before": json.dumps(before, indent=4),
-                    "after": json.dumps(after_calculated, indent=4),
-                }
+                self.result['changed'] = True
+                self.setDiff(
+                    {configuration: before[configuration] for configuration in changes},
+                    {
+                        configuration: {
+                            "value": value,
+                            "editable": before[configuration]['editable']
+                        }
+                        for configuration, value in changes.items()
+                    }
+                )
 
             # Apply change without checkmode
             else:
                 set_request = requests.put(
                     self.api_url+'/configurations',
                     auth=self.auth,
-                    json=desired_configuration,
+                    json=self.result['desired_configuration'],
                 )
                 if set_request.status_code == 200:
                     pass
                 elif set_request.status_code == 401:
-                    self.module.fail_json(msg="User need to log in first.", **result)
+                    self.module.fail_json(msg="User need to log in first.", **self.result)
                 elif set_request.status_code == 403:
-                    self.module.fail_json(msg="User does not have permission of admin role.", **result)
+                    self.module.fail_json(msg="User does not have permission of admin role.", **self.result)
                 elif set_request.status_code == 500:
-                    self.module.fail_json(msg="Unexpected internal errors.", **result)
+                    self.module.fail_json(msg="Unexpected internal errors.", **self.result)
                 else:
                     self.module.fail_json(msg=f"""
                         Unknown HTTP status code: {set_request.status_code}
@@ -123,16 +129,14 @@ class HarborConfigModule(HarborBaseModule):
                     auth=self.auth
                 )
                 after = after_request.json()
-                result['configuration'] = after.copy()
+                self.result['configuration'] = after
 
-                if before != after:
-                    result['changed'] = True
-                    result['diff'] = {
-                        "before": json.dumps(before, indent=4),
-                        "after": json.dumps(after, indent=4),
-                    }
+                applied = computePatch(after, before)
+                if applied:
+                    self.result['changed'] = True
+                    self.setDiff(selectPaths(applied, before), applied)
 
-        self.module.exit_json(**result)
+        self.module.exit_json(**self.result)
 
 def main():
     HarborConfigModule()
@@ -13,9 +13,35 @@ version_added: ""
 short_description: Manages Harbor garbage collection settings
 description:
   - Update Harbor garbage collection options over API.
+  - Can trigger a garbage collection run, by default as dry run to estimate the reclaimable space.
+options:
+  schedule_cron:
+    description:
+    - Cron of the garbage collection schedule. Required unless `run_now` is set.
+    required: false
+    type: str
+  delete_untagged:
+    description:
+    - Delete untagged artifacts.
+    required: true
+    type: bool
+  workers:
+    description:
+    - Number of parallel workers (Harbor 2.5+).
+    required: false
+    type: int
+    default: 1
+  dry_run:
+    description:
+    - Only estimate freed space and deleted blobs with `run_now`.
+    required: false
+    type: bool
+    default: true
 
 extends_documentation_fragment:
   - swisstxt.harbor.api
+  - swisstxt.harbor.job
+  - swisstxt.harbor.journal
 '''
 
 import copy
@@ -24,10 +50,15 @@ import json
 import requests
 from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
-    HarborBaseModule
+    HarborApiError
+from ansible_collections.swisstxt.harbor.plugins.module_utils.job import \
+    HarborJobBaseModule
 
 
-class HarborGarbageCollectionModule(HarborBaseModule):
+class HarborGarbageCollectionModule(HarborJobBaseModule):
+    # workers is part of the schedule, dry_run only applies to run_now
+    RUN_CONTROL_OPTIONS = HarborJobBaseModule.RUN_CONTROL_OPTIONS + ['dry_run']
+
     def getGarbageCollection(self):
         gc_request = requests.get(
             f"{self.api_url}/system/gc/schedule",
@@ -42,7 +73,8 @@ class HarborGarbageCollectionModule(HarborBaseModule):
 
         return {
             "parameters": {
-                "delete_untagged": job_parameters['delete_untagged']
+                "delete_untagged": job_parameters['delete_untagged'],
+                "workers": job_parameters.get('workers', 1)
             },
             "schedule": gc['schedule']
         }
@@ -56,10 +88,11 @@ class HarborGarbageCollectionModule(HarborBaseModule):
         if not put_gc_request.status_code == 200:
             self.module.fail_json(msg=self.requestParse(put_gc_request))
 
-    def constructDesired(self, delete_untagged, schedule_cron):
+    def constructDesired(self, delete_untagged, schedule_cron, workers=1):
         return {
             "parameters": {
-                "delete_untagged": delete_untagged
+                "delete_untagged": delete_untagged,
+                "workers": workers
             },
             "schedule": {
                 "cron": schedule_cron,
@@ -72,16 +105,23 @@ class HarborGarbageCollectionModule(HarborBaseModule):
     def argspec(self):
         argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
         argument_spec.update(
-            schedule_cron=dict(type='str', required=True),
+            schedule_cron=dict(type='str', required=False),
             delete_untagged=dict(type='bool', required=True),
+            workers=dict(type='int', required=False, default=1),
+            dry_run=dict(type='bool', required=False, default=True),
             state=dict(default='present', choices=['present'])
         )
+        argument_spec.update(self.RUN_ARG_SPEC)
+        argument_spec.update(self.JOURNAL_ARG_SPEC)
         return argument_spec
 
     def __init__(self):
         self.module = AnsibleModule(
             argument_spec=self.argspec,
-            supports_check_mode=True
+            supports_check_mode=True,
+            required_if=[
+                ('run_now', False, ('schedule_cron',))
+            ]
         )
 
         super().__init__()
@@ -90,17 +130,35 @@ class HarborGarbageCollectionModule(HarborBaseModule):
             changed=False
         )
 
-        desired = self.constructDesired(self.module.params["delete_untagged"], self.module.params["schedule_cron"])
+        if self.module.params['run_now']:
+            run = self.runNow('gc', {
+                "delete_untagged": self.module.params['delete_untagged'],
+                "workers": self.module.params['workers'],
+                "dry_run": self.module.params['dry_run']
+            })
+
+            # Estimated (dry run) or actually freed space
+            if run is not None and run['status'] == 'Success':
+                try:
+                    run.update(self.parseGcLog(self.getExecutionLog('gc', run['id'])))
+                except HarborApiError as e:
+                    self.module.fail_json(msg=str(e), **self.result)
+
+            if not self.module.params['dry_run']:
+                self.result['changed'] = True
+
+            if self.module.params['schedule_cron'] is None:
+                self.module.exit_json(**self.result)
+
+        self.journalCheck('gc', 'schedule')
+        desired = self.constructDesired(self.module.params["delete_untagged"], self.module.params["schedule_cron"], self.module.params["workers"])
         before = self.getGarbageCollection()
 
         if desired != before:
             # Test change with checkmode
             if self.module.check_mode:
                 self.result['changed'] = True
-                self.result['diff'] = {
-                    "before": json.dumps(before, indent=4),
-                    "after": json.dumps(desired, indent=4),
-                }
+                self.setDiff(before, desired)
 
             # Apply change without checkmode
             else:
@@ -109,11 +167,9 @@ class HarborGarbageCollectionModule(HarborBaseModule):
                 after = self.getGarbageCollection()
 
                 self.result['changed'] = True
-                self.result['diff'] = {
-                    "before": json.dumps(before, indent=4),
-                    "after": json.dumps(after, indent=4),
-                }
+                self.setDiff(before, after)
 
+        self.journalRecord()
         self.module.exit_json(**self.result)
 
 
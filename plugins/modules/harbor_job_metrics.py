@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_job_metrics
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Get Harbor maintenance job metrics
+description:
+  - Read execution history of Harbor garbage collection, purge audit and scan all over API.
+  - Returns duration, freed bytes, failure rate and overlap statistics to choose schedule windows.
+  - Harbor keeps no history for scan all, only the metrics of the latest run are returned.
+options:
+  jobs:
+    description:
+    - Jobs to get metrics for.
+    required: false
+    type: list
+    elements: str
+    choices: ['gc', 'purgeaudit', 'scan_all']
+    default: ['gc', 'purgeaudit', 'scan_all']
+  since_days:
+    description:
+    - Only consider executions created in the last days.
+    required: false
+    type: int
+    default: 30
+  parse_logs:
+    description:
+    - Read garbage collection logs to get freed bytes and deleted blobs.
+    required: false
+    type: bool
+    default: true
+  workers:
+    description:
+    - Number of logs fetched in parallel.
+    required: false
+    type: int
+    default: 4
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import copy
+from datetime import datetime, timedelta
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError
+from ansible_collections.swisstxt.harbor.plugins.module_utils.job import \
+    HarborJobBaseModule
+
+
+class HarborJobMetricsModule(HarborJobBaseModule):
+    def collectExecutions(self, job, since):
+        # Compact series entry: [start, duration seconds, status, freed bytes]
+        series = []
+        gc_ids = []
+        for execution in self.listExecutions(job, since):
+            series.append([
+                self.parseTime(execution['creation_time']),
+                self.executionDuration(execution),
+                execution['job_status'],
+                None
+            ])
+            if job == 'gc' and execution['job_status'] == 'Success':
+                gc_ids.append((len(series) - 1, execution['id']))
+
+        if gc_ids and self.module.params['parse_logs']:
+            logs = self.runConcurrently(
+                lambda gc_id: self.parseGcLog(self.getExecutionLog('gc', gc_id[1])),
+                gc_ids,
+                self.module.params['workers']
+            )
+            for (index, gc_id), summary in logs:
+                series[index][3] = summary['freed_bytes']
+
+        series.reverse()
+        return series
+
+    def summarize(self, series):
+        durations = sorted(entry[1] for entry in series if entry[1] is not None)
+        finished = [entry for entry in series if entry[2] in self.FINAL_STATUSES]
+        failed = [entry for entry in finished if entry[2] != 'Success']
+        freed = [entry[3] for entry in series if entry[3] is not None]
+
+        # Seconds per hour of day (UTC) the job was running
+        busy_hours = [0] * 24
+        for start, duration, status, freed_bytes in series:
+            cursor = start
+            end = start + timedelta(seconds=duration or 0)
+            while cursor < end:
+                hour_end = cursor.replace(minute=0, second=0) + timedelta(hours=1)
+                busy_hours[cursor.hour] += int((min(hour_end, end) - cursor).total_seconds())
+                cursor = hour_end
+
+        summary = {
+            "executions": len(series),
+            "failed": len(failed),
+            "failure_rate": round(len(failed) / len(finished), 4) if finished else None,
+            "duration": None,
+            "freed_bytes": sum(freed) if freed else None,
+            "busy_hours": busy_hours,
+        }
+        if durations:
+            summary['duration'] = {
+                "min": durations[0],
+                "avg": int(sum(durations) / len(durations)),
+                "p95": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                "max": durations[-1],
+            }
+        return summary
+
+    def overlaps(self, series_by_job):
+        # Sweep over all executions ordered by start, counting pairs of different jobs running at once
+        intervals = []
+        for job, series in series_by_job.items():
+            for start, duration, status, freed_bytes in series:
+                if duration is not None:
+                    intervals.append((start, start + timedelta(seconds=duration), job))
+        intervals.sort()
+
+        overlap = {
+            "count": 0,
+            "seconds": 0,
+            "pairs": {}
+        }
+        active = []
+        for start, end, job in intervals:
+            active = [interval for interval in active if interval[1] > start]
+            for active_start, active_end, active_job in active:
+                if active_job == job:
+                    continue
+                pair = "+".join(sorted([job, active_job]))
+                overlap['count'] += 1
+                overlap['seconds'] += int((min(end, active_end) - start).total_seconds())
+                overlap['pairs'][pair] = overlap['pairs'].get(pair, 0) + 1
+            active.append((start, end, job))
+
+        return overlap
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            jobs=dict(
+                type='list',
+                elements='str',
+                required=False,
+                choices=['gc', 'purgeaudit', 'scan_all'],
+                default=['gc', 'purgeaudit', 'scan_all']
+            ),
+            since_days=dict(type='int', required=False, default=30),
+            parse_logs=dict(type='bool', required=False, default=True),
+            workers=dict(type='int', required=False, default=4),
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            jobs={}
+        )
+
+        since = datetime.utcnow() - timedelta(days=self.module.params['since_days'])
+
+        try:
+            series_by_job = {}
+            for job in self.module.params['jobs']:
+                if job == 'scan_all':
+                    self.result['jobs'][job] = {
+                        "latest": self.getScanAllMetrics()
+                    }
+                    continue
+
+                series_by_job[job] = self.collectExecutions(job, since)
+                self.result['jobs'][job] = self.summarize(series_by_job[job])
+                self.result['jobs'][job]['series'] = [
+                    [start.strftime(self.TIME_FORMAT), duration, status, freed_bytes]
+                    for start, duration, status, freed_bytes in series_by_job[job]
+                ]
+
+            self.result['overlap'] = self.overlaps(series_by_job)
+
+        except HarborApiError as e:
+            self.module.fail_json(msg=str(e), **self.result)
+
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborJobMetricsModule()
+
+if __name__ == '__main__':
+    main()
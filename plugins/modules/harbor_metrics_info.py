@@ -0,0 +1,324 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_metrics_info
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Read and assert Harbor Prometheus metrics
+description:
+  - Scrape the Prometheus metrics of Harbor (Harbor 2.2+ with metrics enabled).
+  - The response is parsed line by line while it is received, only selected metrics are kept.
+  - Histograms are returned as count, sum and quantiles over all their series.
+options:
+  metrics_url:
+    description:
+    - URL of the metrics endpoint, defaults to port 9090 and path `/metrics` of the `api_url` host.
+    required: false
+    type: str
+  metrics:
+    description:
+    - Regular expressions of the metric names to return, like `harbor_task_queue_.*`.
+    required: false
+    type: list
+    elements: str
+    default: []
+  quantiles:
+    description:
+    - Quantiles computed of returned histograms.
+    required: false
+    type: list
+    elements: float
+    default: [0.5, 0.9, 0.99]
+  assertions:
+    description:
+    - Conditions like `harbor_task_queue_size{type="REPLICATION"} < 100`.
+    - The series matching the labels are summed up, or aggregated with `max()`, `min()` or `avg()` around the selector.
+    - Quantiles of histograms are asserted with `p<percentile>()`, like `p99(registry_http_request_duration_seconds) < 2`.
+    - Counts and sums of histograms are asserted with `<histogram>_count` and `<histogram>_sum`, like any other metric.
+    - Operators are `<`, `<=`, `>`, `>=`, `==` and `!=`. Assertions without matching series fail.
+    required: false
+    type: list
+    elements: str
+    default: []
+  fail_on_violation:
+    description:
+    - Fail if an assertion is violated, otherwise they are only returned in `violations`.
+    required: false
+    type: bool
+    default: false
+  timeout:
+    description:
+    - Seconds to wait for the metrics endpoint.
+    required: false
+    type: int
+    default: 30
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import copy
+import operator
+import re
+from urllib.parse import urlparse
+
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborBaseModule
+
+
+class HarborMetricsInfoModule(HarborBaseModule):
+    SAMPLE_PATTERN = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)(?:\s+-?\d+)?$')
+    LABEL_PATTERN = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"((?:[^"\\]|\\.)*)"')
+    ASSERTION_PATTERN = re.compile(
+        r'^\s*(?:(sum|max|min|avg|p\d+(?:\.\d+)?)\s*\(\s*)?'
+        r'([a-zA-Z_:][a-zA-Z0-9_:]*)\s*(?:\{(.*)\})?\s*\)?'
+        r'\s*(<=|>=|==|!=|<|>)\s*(\S+)\s*$'
+    )
+    OPERATORS = {
+        '<': operator.lt,
+        '<=': operator.le,
+        '>': operator.gt,
+        '>=': operator.ge,
+        '==': operator.eq,
+        '!=': operator.ne
+    }
+    HISTOGRAM_SUFFIXES = ['_bucket', '_sum', '_count']
+
+    def parseLabels(self, text):
+        if not text:
+            return {}
+        return {
+            name: value.replace('\\"', '"').replace('\\n', '\n').replace('\\\\', '\\')
+            for name, value in self.LABEL_PATTERN.findall(text)
+        }
+
+    def parseAssertion(self, assertion):
+        match = self.ASSERTION_PATTERN.match(assertion)
+        if match is None:
+            self.module.fail_json(msg=f"Invalid assertion: {assertion}", **self.result)
+        function, name, labels, comparison, threshold = match.groups()
+        try:
+            threshold = float(threshold)
+        except ValueError:
+            self.module.fail_json(msg=f"Invalid threshold in assertion: {assertion}", **self.result)
+        return {
+            "assertion": assertion,
+            "function": function or 'sum',
+            "name": name,
+            "labels": self.parseLabels(labels),
+            "operator": comparison,
+            "threshold": threshold
+        }
+
+    def isSelected(self, name):
+        # Decided once per metric name, the same name repeats for every series
+        if name not in self.selected:
+            self.selected[name] = name in self.asserted or any(pattern.fullmatch(name) for pattern in self.patterns)
+        return self.selected[name]
+
+    def histogramName(self, name):
+        for suffix in self.HISTOGRAM_SUFFIXES:
+            if name.endswith(suffix) and name[:-len(suffix)] in self.histogram_types:
+                return name[:-len(suffix)], suffix
+        return None, None
+
+    def addSample(self, line):
+        match = self.SAMPLE_PATTERN.match(line)
+        if match is None:
+            return
+        name, labels, value = match.groups()
+
+        histogram, suffix = self.histogramName(name)
+        if histogram is not None:
+            # `<histogram>_count` and `_sum` may be asserted on their own
+            if not (self.isSelected(histogram) or name in self.asserted):
+                return
+            labels = self.parseLabels(labels)
+            bound = labels.pop('le', None)
+            key = tuple(sorted(labels.items()))
+            series = self.histograms.setdefault(histogram, {}).setdefault(key, {"buckets": {}, "sum": 0.0, "count": 0.0})
+            if suffix == '_bucket':
+                series['buckets'][float(bound)] = float(value)
+            else:
+                series[suffix[1:]] = float(value)
+            return
+
+        if not self.isSelected(name):
+            return
+        self.series.setdefault(name, []).append({
+            "labels": self.parseLabels(labels),
+            "value": float(value)
+        })
+
+    def scrape(self, metrics_url):
+        metrics_request = requests.get(metrics_url, stream=True, timeout=self.module.params['timeout'])
+        if not metrics_request.status_code == 200:
+            self.module.fail_json(msg=self.requestParse(metrics_request), **self.result)
+
+        with metrics_request:
+            for line in metrics_request.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                if line.startswith('#'):
+                    # `# TYPE <name> histogram` precedes the samples of a histogram
+                    fields = line.split()
+                    if len(fields) == 4 and fields[1] == 'TYPE' and fields[3] == 'histogram':
+                        self.histogram_types.add(fields[2])
+                    continue
+                self.addSample(line)
+
+    def mergeHistogram(self, histogram, labels=None):
+        # Sum up all series of a histogram matching the labels
+        merged = {"buckets": {}, "sum": 0.0, "count": 0.0}
+        for key, series in self.histograms.get(histogram, {}).items():
+            if labels and not all(dict(key).get(name) == value for name, value in labels.items()):
+                continue
+            for bound, count in series['buckets'].items():
+                merged['buckets'][bound] = merged['buckets'].get(bound, 0.0) + count
+            merged['sum'] += series['sum']
+            merged['count'] += series['count']
+        return merged
+
+    def quantile(self, q, buckets):
+        # Linear interpolation within the bucket, like histogram_quantile() of Prometheus
+        bounds = sorted(buckets)
+        if not bounds or buckets[bounds[-1]] == 0:
+            return None
+        rank = q * buckets[bounds[-1]]
+        previous_bound = 0.0
+        previous_count = 0.0
+        for bound in bounds:
+            count = buckets[bound]
+            if count >= rank:
+                if bound == float('inf'):
+                    return previous_bound
+                if count == previous_count:
+                    return bound
+                return previous_bound + (bound - previous_bound) * (rank - previous_count) / (count - previous_count)
+            previous_bound = bound
+            previous_count = count
+        return previous_bound
+
+    def evaluate(self, assertion):
+        function = assertion['function']
+        if function.startswith('p'):
+            merged = self.mergeHistogram(assertion['name'], assertion['labels'])
+            return self.quantile(float(function[1:]) / 100, merged['buckets'])
+
+        histogram, suffix = self.histogramName(assertion['name'])
+        if histogram is not None and suffix != '_bucket':
+            # Stored with the histogram, one value per series
+            values = [
+                series[suffix[1:]] for key, series in self.histograms.get(histogram, {}).items()
+                if all(dict(key).get(name) == value for name, value in assertion['labels'].items())
+            ]
+        else:
+            values = [
+                series['value'] for series in self.series.get(assertion['name'], [])
+                if all(series['labels'].get(name) == value for name, value in assertion['labels'].items())
+            ]
+        if not values:
+            return None
+        if function == 'max':
+            return max(values)
+        if function == 'min':
+            return min(values)
+        if function == 'avg':
+            return sum(values) / len(values)
+        return sum(values)
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            metrics_url=dict(type='str', required=False),
+            metrics=dict(type='list', elements='str', required=False, default=[]),
+            quantiles=dict(type='list', elements='float', required=False, default=[0.5, 0.9, 0.99]),
+            assertions=dict(type='list', elements='str', required=False, default=[]),
+            fail_on_violation=dict(type='bool', required=False, default=False),
+            timeout=dict(type='int', required=False, default=30),
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            series={},
+            histograms={},
+            assertions=[],
+            violations=[]
+        )
+
+        try:
+            self.patterns = [re.compile(pattern) for pattern in self.module.params['metrics']]
+        except re.error as e:
+            self.module.fail_json(msg=f"Invalid regex: {e}", **self.result)
+        assertions = [self.parseAssertion(assertion) for assertion in self.module.params['assertions']]
+        self.asserted = set(assertion['name'] for assertion in assertions)
+
+        metrics_url = self.module.params['metrics_url']
+        if metrics_url is None:
+            api_url = urlparse(self.api_url)
+            metrics_url = f"{api_url.scheme}://{api_url.hostname}:9090/metrics"
+
+        self.selected = {}
+        self.histogram_types = set()
+        self.series = {}
+        self.histograms = {}
+        try:
+            self.scrape(metrics_url)
+        except requests.exceptions.RequestException as e:
+            self.module.fail_json(msg=f"Scraping {metrics_url} failed: {e}", **self.result)
+
+        # Only explicitly selected metrics are returned, not the asserted ones
+        for name, series in self.series.items():
+            if any(pattern.fullmatch(name) for pattern in self.patterns):
+                self.result['series'][name] = series
+        for name in self.histograms:
+            if any(pattern.fullmatch(name) for pattern in self.patterns):
+                merged = self.mergeHistogram(name)
+                self.result['histograms'][name] = {
+                    "count": merged['count'],
+                    "sum": merged['sum'],
+                    "quantiles": {
+                        str(q): self.quantile(q, merged['buckets'])
+                        for q in self.module.params['quantiles']
+                    }
+                }
+
+        for assertion in assertions:
+            value = self.evaluate(assertion)
+            ok = value is not None and self.OPERATORS[assertion['operator']](value, assertion['threshold'])
+            self.result['assertions'].append({
+                "assertion": assertion['assertion'],
+                "value": value,
+                "ok": ok
+            })
+            if not ok:
+                self.result['violations'].append(assertion['assertion'])
+
+        if self.module.params['fail_on_violation'] and self.result['violations']:
+            self.module.fail_json(msg=f"Violated assertions: {self.result['violations']}", **self.result)
+
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborMetricsInfoModule()
+
+if __name__ == '__main__':
+    main()
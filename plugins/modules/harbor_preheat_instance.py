@@ -0,0 +1,243 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_preheat_instance
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Manage Harbor P2P preheat provider instances
+description:
+  - Create and update Harbor P2P preheat provider instances (Dragonfly, Kraken) over API.
+options:
+  name:
+    description:
+    - Name of the instance.
+    required: true
+    type: str
+  vendor:
+    description:
+    - Provider of the instance.
+    required: true
+    type: str
+    choices: ['dragonfly', 'kraken']
+  endpoint_url:
+    description:
+    - URL of the provider.
+    required: true
+    type: str
+  description:
+    description:
+    - Description of the instance.
+    required: false
+    type: str
+  auth_mode:
+    description:
+    - Authentication against the provider.
+    required: false
+    type: str
+    choices: ['NONE', 'BASIC', 'OAUTH']
+    default: 'NONE'
+  username:
+    description:
+    - Username for `BASIC` authentication.
+    required: false
+    type: str
+  password:
+    description:
+    - Password for `BASIC` authentication.
+    required: false
+    type: str
+  token:
+    description:
+    - Token for `OAUTH` authentication.
+    required: false
+    type: str
+  update_password:
+    description:
+    - When `password` and `token` are sent to Harbor. They aren't returned by the API, so they can't be compared.
+    - They are sent with every create or update of the instance.
+    - C(always) also updates the instance if nothing else changed, so it is reported as changed on every run.
+    - C(on_create) only updates the instance if another field changed.
+    required: false
+    type: str
+    choices: ['always', 'on_create']
+    default: 'on_create'
+  enabled:
+    description:
+    - Enable the instance.
+    required: false
+    type: bool
+  default:
+    description:
+    - Make the instance the default one.
+    required: false
+    type: bool
+  insecure:
+    description:
+    - Skip certificate verification of the provider.
+    required: false
+    type: bool
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import copy
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborBaseModule
+
+
+class HarborPreheatInstanceModule(HarborBaseModule):
+    # Changed by Harbor on every read
+    IGNORED_FIELDS = ['status', 'setup_timestamp']
+    # Not returned by the API, so they can't be compared
+    SECRET_FIELDS = ['password', 'token']
+
+    def comparable(self, instance):
+        instance = copy.deepcopy(instance)
+        for field in self.IGNORED_FIELDS:
+            instance.pop(field, None)
+        instance['auth_info'] = {
+            key: value for key, value in (instance.get('auth_info') or {}).items()
+            if key not in self.SECRET_FIELDS
+        }
+        return instance
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            name=dict(type='str', required=True),
+            vendor=dict(type='str', required=True, choices=['dragonfly', 'kraken']),
+            endpoint_url=dict(type='str', required=True),
+            description=dict(type='str', required=False),
+            auth_mode=dict(type='str', required=False, default='NONE', choices=['NONE', 'BASIC', 'OAUTH']),
+            username=dict(type='str', required=False),
+            password=dict(type='str', required=False, no_log=True),
+            token=dict(type='str', required=False, no_log=True),
+            update_password=dict(type='str', required=False, default='on_create', choices=['always', 'on_create']),
+            enabled=dict(type='bool', required=False),
+            default=dict(type='bool', required=False),
+            insecure=dict(type='bool', required=False),
+
+            state=dict(default='present', choices=['present'])
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True,
+            required_if=[
+                ('auth_mode', 'BASIC', ('username', 'password')),
+                ('auth_mode', 'OAUTH', ('token',))
+            ]
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False
+        )
+
+        existing_instance_request = requests.get(
+            f"{self.api_url}/p2p/preheat/instances?q=name%3D{self.module.params['name']}",
+            auth=self.auth
+        )
+
+        existing_instance = existing_instance_request.json()
+
+        desired_instance = {
+            'name': self.module.params['name'],
+            'vendor': self.module.params['vendor'],
+            'endpoint': self.module.params['endpoint_url'],
+            'auth_mode': self.module.params['auth_mode'],
+            'auth_info': {}
+        }
+        for option in ['description', 'enabled', 'default', 'insecure']:
+            if self.module.params[option] is not None:
+                desired_instance[option] = self.module.params[option]
+        if self.module.params['auth_mode'] == 'BASIC':
+            desired_instance['auth_info'] = {
+                'username': self.module.params['username'],
+                'password': self.module.params['password']
+            }
+        if self.module.params['auth_mode'] == 'OAUTH':
+            desired_instance['auth_info'] = {
+                'token': self.module.params['token']
+            }
+
+        if existing_instance:
+            existing_instance = existing_instance[0]
+            self.result['instance'] = self.comparable(existing_instance)
+
+            # Check & "calculate" desired configuration
+            before = self.comparable(existing_instance)
+            after_calculated = copy.deepcopy(before)
+            after_calculated.update(self.comparable(desired_instance))
+
+            # Secrets can't be compared, whether they alone are a change
+            # depends on update_password. auth_info is replaced as a whole,
+            # so they are always sent with an update.
+            secrets_changed = self.module.params['update_password'] == 'always' \
+                and any(field in desired_instance['auth_info'] for field in self.SECRET_FIELDS)
+
+            if before == after_calculated and not secrets_changed:
+                self.module.exit_json(**self.result)
+
+            if self.module.check_mode:
+                self.result['changed'] = True
+                self.setDiff(before, after_calculated)
+
+            else:
+                desired_instance['id'] = existing_instance['id']
+                set_request = requests.put(
+                    f'{self.api_url}/p2p/preheat/instances/{self.module.params["name"]}',
+                    auth=self.auth,
+                    json=desired_instance,
+                )
+
+                if not set_request.status_code == 200:
+                    self.module.fail_json(msg=self.requestParse(set_request))
+
+                after_request = requests.get(
+                    f'{self.api_url}/p2p/preheat/instances/{self.module.params["name"]}',
+                    auth=self.auth
+                )
+                after = self.comparable(after_request.json())
+                self.result['instance'] = after
+                self.result['changed'] = True
+                if before != after:
+                    self.setDiff(before, after)
+
+        else:
+            if not self.module.check_mode:
+                create_instance_request = requests.post(
+                    self.api_url+'/p2p/preheat/instances',
+                    auth=self.auth,
+                    json=desired_instance
+                )
+                if not create_instance_request.status_code == 201:
+                    self.module.fail_json(msg=self.requestParse(create_instance_request))
+
+                after_request = requests.get(
+                    f"{self.api_url}/p2p/preheat/instances?q=name%3D{self.module.params['name']}",
+                    auth=self.auth
+                )
+                self.result['instance'] = copy.deepcopy(after_request.json())
+
+            self.result['changed'] = True
+
+        self.module.exit_json(**self.result)
+
+def main():
+    HarborPreheatInstanceModule()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_preheat_policy
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Manage Harbor P2P preheat policies
+description:
+  - Create and update P2P preheat policies of a Harbor project over API.
+  - Can trigger a preheat execution and wait for it to finish.
+options:
+  project:
+    description:
+    - Name of the project.
+    required: true
+    type: str
+  name:
+    description:
+    - Name of the policy.
+    required: true
+    type: str
+  provider:
+    description:
+    - Name of the preheat instance, see `harbor_preheat_instance`.
+    required: true
+    type: str
+  description:
+    description:
+    - Description of the policy.
+    required: false
+    type: str
+  repositories:
+    description:
+    - Doublestar pattern of repositories to preheat.
+    required: false
+    type: str
+    default: '**'
+  tags:
+    description:
+    - Doublestar pattern of tags to preheat.
+    required: false
+    type: str
+    default: '**'
+  trigger:
+    description:
+    - When the policy runs.
+    required: false
+    type: str
+    choices: ['manual', 'scheduled', 'event_based']
+    default: 'manual'
+  schedule_cron:
+    description:
+    - Cron of the `scheduled` trigger.
+    required: false
+    type: str
+    default: ''
+  enabled:
+    description:
+    - Enable the policy.
+    required: false
+    type: bool
+    default: true
+  run_now:
+    description:
+    - Execute the policy once now, additionally to its trigger.
+    required: false
+    type: bool
+    default: false
+  wait:
+    description:
+    - Wait for the execution started with `run_now` to finish.
+    - Status, metrics and duration of the execution are returned in `run`.
+    required: false
+    type: bool
+    default: true
+  wait_timeout:
+    description:
+    - Seconds to wait for the execution to finish.
+    required: false
+    type: int
+    default: 3600
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import copy
+import json
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+
+
+class HarborPreheatPolicyModule(HarborBaseModule):
+    # Not part of the desired configuration
+    IGNORED_FIELDS = ['creation_time', 'update_time', 'provider_name']
+
+    FINAL_STATUSES = ['Success', 'Error', 'Stopped']
+
+    def normalize(self, policy):
+        # Filters and trigger are JSON encoded strings in the API
+        policy = copy.deepcopy(policy)
+        for field in self.IGNORED_FIELDS:
+            policy.pop(field, None)
+        for field in ['filters', 'trigger']:
+            if isinstance(policy.get(field), str):
+                policy[field] = json.loads(policy[field] or 'null')
+        if policy.get('filters'):
+            policy['filters'] = sorted(policy['filters'], key=lambda item: item['type'])
+        return policy
+
+    def getProvider(self, name):
+        provider_request = requests.get(
+            f"{self.api_url}/p2p/preheat/instances?q=name%3D{name}",
+            auth=self.auth
+        )
+        providers = provider_request.json()
+        if not providers:
+            self.module.fail_json(msg=f"Preheat instance {name} not found", **self.result)
+        return providers[0]
+
+    def preheat(self, policy):
+        policy_path = f"{self.api_url}/projects/{self.module.params['project']}/preheat/policies/{self.module.params['name']}"
+        execution_request = requests.post(
+            policy_path,
+            auth=self.auth,
+            json=policy
+        )
+        if not execution_request.status_code == 201:
+            raise HarborApiError(self.requestParse(execution_request))
+        execution_id = int(execution_request.headers['Location'].rstrip("/").rsplit("/", 1)[1])
+
+        run = {
+            "id": execution_id,
+            "status": "Pending"
+        }
+        if not self.module.params['wait']:
+            return run
+
+        def check():
+            status_request = requests.get(
+                f"{policy_path}/executions/{execution_id}",
+                auth=self.auth
+            )
+            if not status_request.status_code == 200:
+                raise HarborApiError(self.requestParse(status_request))
+            execution = status_request.json()
+            if execution['status'] in self.FINAL_STATUSES:
+                return execution
+            return None
+
+        execution = self.waitFor(
+            check,
+            self.module.params['wait_timeout'],
+            f"Timeout waiting for preheat execution {execution_id}"
+        )
+        run['status'] = execution['status']
+        run['metrics'] = execution.get('metrics')
+        if execution.get('start_time') and execution.get('end_time'):
+            run['duration'] = int((self.parseTime(execution['end_time']) - self.parseTime(execution['start_time'])).total_seconds())
+        return run
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            project=dict(type='str', required=True),
+            name=dict(type='str', required=True),
+            provider=dict(type='str', required=True),
+            description=dict(type='str', required=False),
+            repositories=dict(type='str', required=False, default='**'),
+            tags=dict(type='str', required=False, default='**'),
+            trigger=dict(type='str', required=False, default='manual', choices=['manual', 'scheduled', 'event_based']),
+            schedule_cron=dict(type='str', required=False, default=''),
+            enabled=dict(type='bool', required=False, default=True),
+
+            run_now=dict(type='bool', required=False, default=False),
+            wait=dict(type='bool', required=False, default=True),
+            wait_timeout=dict(type='int', required=False, default=3600),
+
+            state=dict(default='present', choices=['present'])
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True,
+            required_if=[
+                ('trigger', 'scheduled', ('schedule_cron',))
+            ]
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False
+        )
+
+        project = self.getProjectByName(self.module.params['project'])
+        if not project:
+            self.module.fail_json(msg="Project not found", **self.result)
+        provider = self.getProvider(self.module.params['provider'])
+
+        policies_url = f"{self.api_url}/projects/{self.module.params['project']}/preheat/policies"
+        existing_policy_request = requests.get(
+            f"{policies_url}?q=name%3D{self.module.params['name']}",
+            auth=self.auth
+        )
+
+        existing_policy = existing_policy_request.json()
+
+        desired_policy = {
+            'name': self.module.params['name'],
+            'project_id': project['project_id'],
+            'provider_id': provider['id'],
+            'enabled': self.module.params['enabled'],
+            'filters': json.dumps([
+                {'type': 'repository', 'value': self.module.params['repositories']},
+                {'type': 'tag', 'value': self.module.params['tags']}
+            ]),
+            'trigger': json.dumps({
+                'type': self.module.params['trigger'],
+                'trigger_setting': {
+                    'cron': self.module.params['schedule_cron']
+                }
+            })
+        }
+        if self.module.params['description'] is not None:
+            desired_policy['description'] = self.module.params['description']
+
+        if existing_policy:
+            existing_policy = self.normalize(existing_policy[0])
+
+            # Check & "calculate" desired configuration
+            self.result['policy'] = copy.deepcopy(existing_policy)
+            after_calculated = copy.deepcopy(existing_policy)
+            after_calculated.update(self.normalize(desired_policy))
+
+            if existing_policy != after_calculated:
+                self.result['changed'] = True
+                self.setDiff(existing_policy, after_calculated)
+
+                if not self.module.check_mode:
+                    desired_policy['id'] = existing_policy['id']
+                    set_request = requests.put(
+                        f"{policies_url}/{self.module.params['name']}",
+                        auth=self.auth,
+                        json=desired_policy,
+                    )
+
+                    if not set_request.status_code == 200:
+                        self.module.fail_json(msg=self.requestParse(set_request))
+
+                    after_request = requests.get(
+                        f"{policies_url}/{self.module.params['name']}",
+                        auth=self.auth
+                    )
+                    self.result['policy'] = self.normalize(after_request.json())
+
+        else:
+            if not self.module.check_mode:
+                create_policy_request = requests.post(
+                    policies_url,
+                    auth=self.auth,
+                    json=desired_policy
+                )
+                if not create_policy_request.status_code == 201:
+                    self.module.fail_json(msg=self.requestParse(create_policy_request))
+
+                after_request = requests.get(
+                    f"{policies_url}/{self.module.params['name']}",
+                    auth=self.auth
+                )
+                self.result['policy'] = self.normalize(after_request.json())
+
+            self.result['changed'] = True
+
+        if self.module.params['run_now'] and not self.module.check_mode:
+            try:
+                self.result['run'] = self.preheat(dict(desired_policy, id=self.result['policy']['id']))
+            except HarborApiError as e:
+                self.module.fail_json(msg=str(e), **self.result)
+
+            self.result['changed'] = True
+            if self.result['run']['status'] not in ['Success', 'Pending']:
+                self.module.fail_json(msg=f"Preheat finished with status {self.result['run']['status']}", **self.result)
+
+        self.module.exit_json(**self.result)
+
+def main():
+    HarborPreheatPolicyModule()
+
+if __name__ == '__main__':
+    main()
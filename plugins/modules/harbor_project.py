@@ -13,20 +13,136 @@ version_added: ""
 short_description: Manage Harbor project
 description:
   - Create, update and delete Harbor Configuration over API.
+  - Harbor only deletes empty projects. With `purge`, repositories get deleted in parallel (limited by `rate_limit`), then members, robots and policies, before the project is deleted.
 options:
   #TODO
 extends_documentation_fragment:
   - swisstxt.harbor.api
+  - swisstxt.harbor.journal
+  - swisstxt.harbor.checkpoint
 '''
 
 import copy
-import json
+import time
+
 import requests
 from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
-    HarborBaseModule
+    HarborApiError, HarborBaseModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.diff import \
+    computePatch, selectPaths
 
 class HarborProjectModule(HarborBaseModule):
+    # Project content removed by purge: (name, listing path, item path with
+    # the item as format arguments). Harbor refuses to delete repositories
+    # with immutable tags, so their rules go before the repositories.
+    PROTECTING_OBJECTS = [
+        ('immutable_rules', "/projects/{project_id}/immutabletagrules", "/projects/{project_id}/immutabletagrules/{id}"),
+    ]
+    RUN_CONTROL_OPTIONS = HarborBaseModule.RUN_CONTROL_OPTIONS + ['purge', 'workers', 'rate_limit']
+
+    PURGED_OBJECTS = [
+        ('members', "/projects/{project_id}/members", "/projects/{project_id}/members/{id}"),
+        ('webhook_policies', "/projects/{project_id}/webhook/policies", "/projects/{project_id}/webhook/policies/{id}"),
+        ('preheat_policies', "/projects/{project_name}/preheat/policies", "/projects/{project_name}/preheat/policies/{name}"),
+    ]
+
+    def deleteObject(self, path):
+        delete_request = requests.delete(f"{self.api_url}{path}", auth=self.auth)
+        # Already deleted, e.g. by a concurrent run
+        if delete_request.status_code == 404:
+            return False
+        if not delete_request.status_code == 200:
+            raise HarborApiError(self.requestParse(delete_request))
+        return True
+
+    def purgeRepositories(self, project):
+        # Deleted repositories are gone from the listing, a resumed run only
+        # carries over the count
+        checkpoint = self.openCheckpoint(keys=False)
+        checkpoint.total = checkpoint.completed + (project.get('repo_count') or 0)
+        self.result['purged']['repositories'] = 0
+        try:
+            # Walking backwards keeps pagination stable while deleting
+            deletions = self.runConcurrently(
+                lambda repository: self.deleteObject(self.repositoryPath(project['name'], repository['name'])),
+                self.paginateReverse(f"/projects/{project['name']}/repositories"),
+                self.module.params['workers'],
+                self.module.params['rate_limit']
+            )
+            for repository, deleted in deletions:
+                checkpoint.markDone(repository['name'])
+                if deleted:
+                    self.result['purged']['repositories'] += 1
+
+        except HarborApiError:
+            self.result['progress'] = checkpoint.save()
+            raise
+
+        self.result['progress'] = checkpoint.finish()
+
+    def purgeObjects(self, project, objects):
+        path_arguments = {
+            "project_id": project['project_id'],
+            "project_name": project['name']
+        }
+        for name, listing_path, item_path in objects:
+            deletions = self.runConcurrently(
+                lambda item: self.deleteObject(item_path.format(**dict(item, **path_arguments))),
+                list(self.paginate(listing_path.format(**path_arguments))),
+                self.module.params['workers']
+            )
+            self.result['purged'][name] = sum(1 for item, deleted in deletions if deleted)
+
+    def purgeProject(self, project):
+        # Tag retention and immutability rules first, they protect repositories
+        self.purgeObjects(project, self.PROTECTING_OBJECTS)
+        retention_id = (project.get('metadata') or {}).get('retention_id')
+        if retention_id:
+            self.result['purged']['retention_policy'] = self.deleteObject(f"/retentions/{retention_id}")
+
+        self.purgeRepositories(project)
+        self.purgeObjects(project, self.PURGED_OBJECTS)
+
+        robots = self.paginate("/robots", params={"q": f"Level=project,ProjectID={project['project_id']}"})
+        deletions = self.runConcurrently(
+            lambda robot: self.deleteObject(f"/robots/{robot['id']}"),
+            list(robots),
+            self.module.params['workers']
+        )
+        self.result['purged']['robots'] = sum(1 for robot, deleted in deletions if deleted)
+
+    def deleteProject(self, project):
+        if not project:
+            self.journalRecord()
+            self.module.exit_json(**self.result)
+
+        self.result['changed'] = True
+        if self.module.check_mode:
+            self.result['project'] = project
+            self.module.exit_json(**self.result)
+
+        started = time.monotonic()
+        try:
+            if self.module.params['purge']:
+                self.result['purged'] = {}
+                self.purgeProject(project)
+
+            delete_request = requests.delete(
+                f"{self.api_url}/projects/{project['project_id']}",
+                auth=self.auth
+            )
+            if not delete_request.status_code == 200:
+                raise HarborApiError(self.requestParse(delete_request))
+
+        except HarborApiError as e:
+            self.result['duration'] = int(time.monotonic() - started)
+            self.module.fail_json(msg=str(e), **self.result)
+
+        self.result['duration'] = int(time.monotonic() - started)
+        self.journalRecord()
+        self.module.exit_json(**self.result)
+
     @property
     def argspec(self):
         argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
@@ -41,8 +157,14 @@ class HarborProjectModule(HarborBaseModule):
 
             cache_registry=dict(type='str', required=False),
 
-            state=dict(default='present', choices=['present'])
+            purge=dict(type='bool', required=False, default=False),
+            workers=dict(type='int', required=False, default=8),
+            rate_limit=dict(type='float', required=False),
+
+            state=dict(default='present', choices=['present', 'absent'])
         )
+        argument_spec.update(self.CHECKPOINT_ARG_SPEC)
+        argument_spec.update(self.JOURNAL_ARG_SPEC)
         return argument_spec
 
     def __init__(self):
@@ -57,8 +179,13 @@ class HarborProjectModule(HarborBaseModule):
             changed=False
         )
 
+        self.journalCheck('project', self.module.params['name'])
+
         existing_project = self.getProjectByName(self.module.params['name'])
 
+        if self.module.params['state'] == 'absent':
+            self.deleteProject(existing_project)
+
         project_desired_metadata = {}
         if self.module.params['auto_scan'] is not None:
             project_desired_metadata['auto_scan'] = str(self.module.params['auto_scan']).lower()
@@ -104,27 +231,27 @@ class HarborProjectModule(HarborBaseModule):
                         """)
 
 
-            # Check & "calculate" desired configuration
-            self.result['project'] = copy.deepcopy(existing_project)
-            after_calculated = copy.deepcopy(existing_project)
-            after_calculated['metadata'].update(project_desired_metadata)
+            # Only the changed metadata is compared, sent and shown
+            self.result['project'] = existing_project
+            metadata_patch = computePatch(project_desired_metadata, existing_project['metadata'])
 
-            if existing_project == after_calculated:
+            if not metadata_patch:
+                self.journalRecord()
                 self.module.exit_json(**self.result)
 
             if self.module.check_mode:
                 self.result['changed'] = True
-                self.result['diff'] = {
-                    "before": json.dumps(existing_project, indent=4),
-                    "after": json.dumps(after_calculated, indent=4),
-                }
+                self.setDiff(
+                    {"metadata": selectPaths(metadata_patch, existing_project['metadata'])},
+                    {"metadata": metadata_patch}
+                )
 
             else:
                 set_request = requests.put(
                     f'{self.api_url}/projects/{existing_project["project_id"]}',
                     auth=self.auth,
                     json={
-                        "metadata": project_desired_metadata
+                        "metadata": metadata_patch
                     },
                 )
 
@@ -136,13 +263,11 @@ class HarborProjectModule(HarborBaseModule):
                     auth=self.auth
                 )
                 after = after_request.json()
-                self.result['project'] = copy.deepcopy(after)
-                if existing_project != after:
+                self.result['project'] = after
+                applied = computePatch(after, existing_project)
+                if applied:
                     self.result['changed'] = True
-                    self.result['diff'] = {
-                        "before": json.dumps(existing_project, indent=4),
-                        "after": json.dumps(after, indent=4),
-                    }
+                    self.setDiff(selectPaths(applied, existing_project), applied)
 
         else:
             if not self.module.check_mode:
@@ -177,9 +302,10 @@ class HarborProjectModule(HarborBaseModule):
                     f"{self.api_url}/projects?page=1&page_size=1&name={self.module.params['name'] }",
                     auth=self.auth
                 )
-                self.result['project'] = copy.deepcopy(after_request.json())
+                self.result['project'] = after_request.json()
             self.result['changed'] = True
 
+        self.journalRecord()
         self.module.exit_json(**self.result)
 
 def main():
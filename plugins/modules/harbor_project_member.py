@@ -57,7 +57,7 @@ class HarborProjectMemberModule(HarborBaseModule):
 
     @property
     def isGroup(self):
-        return self.module.params['group'] is not None
+        return self.module.params['group'] is not None or self.module.params['group_id'] is not None
 
     def getMemberType(self):
         if self.isUser:
@@ -69,7 +69,7 @@ class HarborProjectMemberModule(HarborBaseModule):
         if self.isUser:
             return self.module.params['user']
         elif self.isGroup:
-            return self.module.params['group']
+            return self.module.params['group'] or self.module.params['group_id']
 
     def listProjectMembers(self, project_id):
         member_list_request = requests.get(
@@ -83,7 +83,12 @@ class HarborProjectMemberModule(HarborBaseModule):
     def getMember(self, project_id, member_name, member_type):
         member_list = self.listProjectMembers(project_id)
         for member in member_list:
-            if member['entity_type'] == member_type and member['entity_name'] == member_name:
+            # Groups imported with harbor_user_groups are referenced by ID
+            if self.module.params['group_id'] is not None:
+                if member['entity_type'] == 'g' and member['entity_id'] == self.module.params['group_id']:
+                    self.result['member'] = copy.deepcopy(member)
+                    return member
+            elif member['entity_type'] == member_type and member['entity_name'] == member_name:
                 self.result['member'] = copy.deepcopy(member)
                 return member
 
@@ -96,6 +101,7 @@ class HarborProjectMemberModule(HarborBaseModule):
             project=dict(type='str', required=True),
             user=dict(type='str', required=False),
             group=dict(type='str', required=False),
+            group_id=dict(type='int', required=False),
             group_type=dict(
                 type='str',
                 required=False,
@@ -118,14 +124,15 @@ class HarborProjectMemberModule(HarborBaseModule):
             argument_spec=self.argspec,
             supports_check_mode=True,
             mutually_exclusive=[
-                ('user', 'group')
+                ('user', 'group', 'group_id')
             ],
             required_if=[
                 ('group_type', 'ldap', ('ldap_group_dn'))
             ],
             required_by={
                 'user': ('role'),
-                'group': ('role', ('group_type'))
+                'group': ('role', ('group_type')),
+                'group_id': ('role')
             }
         )
 
@@ -194,7 +201,13 @@ class HarborProjectMemberModule(HarborBaseModule):
                 "role_id": self.role_id,
             }
 
-            if self.isGroup:
+            if self.module.params['group_id'] is not None:
+                # Existing group, no lookup of the group in LDAP
+                create_payload["member_group"] = {
+                    "id": self.module.params['group_id'],
+                }
+
+            elif self.isGroup:
                 create_payload["member_group"] = {
                     "group_name": self.module.params['group'],
                     "group_type": self.group_type_id,
@@ -0,0 +1,218 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_proxy_cache_warm
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Warm Harbor proxy cache projects
+description:
+  - Pull manifests and blobs of given images through a Harbor proxy cache project, so Harbor fetches them from upstream
+    before nodes need them.
+  - Images are pulled in parallel, blobs are streamed and discarded. Blobs shared by several images are only pulled once.
+  - Every selected platform of an image is checked on its own, so platforms missing from an image cached for other
+    platforms are still pulled.
+  - Bytes of blobs already in the cache are returned in `cached_bytes`, bytes of pulled blobs in `fetched_bytes`.
+options:
+  images:
+    description:
+    - Image references including the proxy cache project, like `dockerhub/library/nginx:1.21`.
+    required: false
+    type: list
+    elements: str
+    default: []
+  images_file:
+    description:
+    - File with one image reference per line, empty lines and lines starting with `#` are ignored.
+    required: false
+    type: path
+  platforms:
+    description:
+    - Platforms pulled from multi-platform images, as `os/architecture`.
+    required: false
+    type: list
+    elements: str
+    default: ['linux/amd64']
+  skip_cached:
+    description:
+    - Do not pull blobs of platform images already in the proxy cache, only count their size.
+    required: false
+    type: bool
+    default: true
+  workers:
+    description:
+    - Number of images pulled in parallel.
+    required: false
+    type: int
+    default: 4
+  registry_url:
+    description:
+    - URL of the registry. Defaults to scheme and host of `api_url`.
+    required: false
+    type: str
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import copy
+import threading
+import time
+
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.registry import \
+    HarborRegistryClient
+
+
+class HarborProxyCacheWarmModule(HarborBaseModule):
+    def readImages(self):
+        for image in self.module.params['images']:
+            yield image
+
+        if self.module.params['images_file'] is not None:
+            with open(self.module.params['images_file']) as images_file:
+                for line in images_file:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        yield line
+
+    def isCached(self, repository, reference):
+        project_name, repository_name = repository.split("/", 1)
+        artifact_request = requests.get(
+            f"{self.api_url}{self.repositoryPath(project_name, repository_name)}/artifacts/{reference}",
+            auth=self.auth
+        )
+        return artifact_request.status_code == 200
+
+    def claimBlob(self, digest):
+        # True if this worker is the first to pull the blob
+        with self.blobs_lock:
+            if digest in self.blobs_seen:
+                return False
+            self.blobs_seen.add(digest)
+            return True
+
+    def selectManifests(self, repository, reference, manifest):
+        # Digests or the reference of the platform images to pull
+        if manifest['mediaType'] not in self.registry.INDEX_TYPES and not manifest.get('manifests'):
+            return [reference]
+
+        references = []
+        for entry in manifest.get('manifests') or []:
+            platform = entry.get('platform') or {}
+            if f"{platform.get('os')}/{platform.get('architecture')}" in self.module.params['platforms']:
+                references.append(entry['digest'])
+        return references
+
+    def warmImage(self, image):
+        started = time.monotonic()
+        repository, reference = self.registry.parseReference(image)
+        image_result = {
+            "image": image,
+            "cached": True,
+            "manifests": 0,
+            "blobs": 0,
+            "cached_bytes": 0,
+            "fetched_bytes": 0
+        }
+
+        # Checked before the manifests are pulled, which caches them
+        top_cached = self.isCached(repository, reference)
+        manifest = self.registry.getManifest(repository, reference)
+        for platform_reference in self.selectManifests(repository, reference, manifest):
+            if platform_reference == reference:
+                cached, platform_manifest = top_cached, manifest
+            else:
+                cached = self.isCached(repository, platform_reference)
+                platform_manifest = self.registry.getManifest(repository, platform_reference)
+            image_result['manifests'] += 1
+            if not cached:
+                image_result['cached'] = False
+
+            for digest, size in self.registry.blobSizes(platform_manifest).items():
+                if not self.claimBlob(digest):
+                    continue
+                image_result['blobs'] += 1
+                if cached:
+                    image_result['cached_bytes'] += size
+                    if not self.module.params['skip_cached']:
+                        self.registry.readBlob(repository, digest)
+                else:
+                    image_result['fetched_bytes'] += self.registry.readBlob(repository, digest)
+
+        image_result['seconds'] = round(time.monotonic() - started, 3)
+        return image_result
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            images=dict(type='list', elements='str', required=False, default=[]),
+            images_file=dict(type='path', required=False),
+            platforms=dict(type='list', elements='str', required=False, default=['linux/amd64']),
+            skip_cached=dict(type='bool', required=False, default=True),
+            workers=dict(type='int', required=False, default=4),
+            registry_url=dict(type='str', required=False),
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            cache_hits=0,
+            fetched=0,
+            cached_bytes=0,
+            fetched_bytes=0,
+            images=[]
+        )
+
+        self.registry = HarborRegistryClient(self.api_url, self.auth, self.module.params['registry_url'])
+        self.blobs_seen = set()
+        self.blobs_lock = threading.Lock()
+
+        if self.module.check_mode:
+            self.module.exit_json(**self.result)
+
+        try:
+            for image, image_result in self.runConcurrently(self.warmImage, self.readImages(), self.module.params['workers']):
+                self.result['images'].append(image_result)
+                if image_result['cached']:
+                    self.result['cache_hits'] += 1
+                else:
+                    self.result['fetched'] += 1
+                self.result['cached_bytes'] += image_result['cached_bytes']
+                self.result['fetched_bytes'] += image_result['fetched_bytes']
+
+        except (HarborApiError, OSError) as e:
+            self.module.fail_json(msg=str(e), **self.result)
+
+        latencies = sorted(image_result['seconds'] for image_result in self.result['images'])
+        if latencies:
+            self.result['latency'] = {
+                "avg": round(sum(latencies) / len(latencies), 3),
+                "max": latencies[-1]
+            }
+
+        self.result['changed'] = self.result['fetched'] > 0
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborProxyCacheWarmModule()
+
+if __name__ == '__main__':
+    main()
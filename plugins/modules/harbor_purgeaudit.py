@@ -16,6 +16,8 @@ description:
 
 extends_documentation_fragment:
   - swisstxt.harbor.api
+  - swisstxt.harbor.job
+  - swisstxt.harbor.journal
 '''
 
 import copy
@@ -23,11 +25,11 @@ import json
 
 import requests
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
-    HarborBaseModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.job import \
+    HarborJobBaseModule
 
 
-class HarborPurgeAuditModule(HarborBaseModule):
+class HarborPurgeAuditModule(HarborJobBaseModule):
     def getPurgeAudit(self):
         purgeaudit_request = requests.get(
             f"{self.api_url}/system/purgeaudit/schedule",
@@ -76,17 +78,22 @@ class HarborPurgeAuditModule(HarborBaseModule):
     def argspec(self):
         argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
         argument_spec.update(
-            schedule_cron=dict(type='str', required=True),
+            schedule_cron=dict(type='str', required=False),
             audit_retention_hour=dict(type='int', required=True),
             included_operations=dict(type='list', required=True, choices=['create', 'delete', 'pull']),
             state=dict(default='present', choices=['present'])
         )
+        argument_spec.update(self.RUN_ARG_SPEC)
+        argument_spec.update(self.JOURNAL_ARG_SPEC)
         return argument_spec
 
     def __init__(self):
         self.module = AnsibleModule(
             argument_spec=self.argspec,
-            supports_check_mode=True
+            supports_check_mode=True,
+            required_if=[
+                ('run_now', False, ('schedule_cron',))
+            ]
         )
 
         super().__init__()
@@ -95,6 +102,18 @@ class HarborPurgeAuditModule(HarborBaseModule):
             changed=False
         )
 
+        if self.module.params['run_now']:
+            self.runNow('purgeaudit', {
+                "audit_retention_hour": self.module.params['audit_retention_hour'],
+                "dry_run": False,
+                "include_operations": ",".join(self.module.params['included_operations'])
+            })
+            self.result['changed'] = True
+
+            if self.module.params['schedule_cron'] is None:
+                self.module.exit_json(**self.result)
+
+        self.journalCheck('purgeaudit', 'schedule')
         desired = self.constructDesired(self.module.params["audit_retention_hour"], self.module.params["included_operations"], self.module.params["schedule_cron"])
         before = self.getPurgeAudit()
 
@@ -102,10 +121,7 @@ class HarborPurgeAuditModule(HarborBaseModule):
             # Test change with checkmode
             if self.module.check_mode:
                 self.result['changed'] = True
-                self.result['diff'] = {
-                    "before": json.dumps(before, indent=4),
-                    "after": json.dumps(desired, indent=4),
-                }
+                self.setDiff(before, desired)
 
             # Apply change without checkmode
             else:
@@ -114,11 +130,9 @@ class HarborPurgeAuditModule(HarborBaseModule):
                 after = self.getPurgeAudit()
 
                 self.result['changed'] = True
-                self.result['diff'] = {
-                    "before": json.dumps(before, indent=4),
-                    "after": json.dumps(after, indent=4),
-                }
+                self.setDiff(before, after)
 
+        self.journalRecord()
         self.module.exit_json(**self.result)
 
 
@@ -17,14 +17,16 @@ options:
   #TODO
 extends_documentation_fragment:
   - swisstxt.harbor.api
+  - swisstxt.harbor.journal
 '''
 
 import copy
-import json
 import requests
 from ansible.module_utils.basic import AnsibleModule
 from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
     HarborBaseModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.diff import \
+    computePatch, selectPaths
 
 
 class HarborRegistryModule(HarborBaseModule):
@@ -48,6 +50,7 @@ class HarborRegistryModule(HarborBaseModule):
 
             state=dict(default='present', choices=['present'])
         )
+        argument_spec.update(self.JOURNAL_ARG_SPEC)
         return argument_spec
 
     def __init__(self):
@@ -62,6 +65,8 @@ class HarborRegistryModule(HarborBaseModule):
             changed=False
         )
 
+        self.journalCheck('registry', self.module.params['name'])
+
         existing_registry_request = requests.get(
             f"{self.api_url}/registries?q=name%3D{self.module.params['name']}",
             auth=self.auth
@@ -89,26 +94,23 @@ class HarborRegistryModule(HarborBaseModule):
         if existing_registry:
             existing_registry = existing_registry[0]
 
-            # Check & "calculate" desired configuration
-            self.result['registry'] = copy.deepcopy(existing_registry)
-            after_calculated = copy.deepcopy(existing_registry)
-            after_calculated.update(desired_registry)
-
             # Ignore secret as it isn't returned with API
-            after_calculated['credential'].pop("access_secret", None)
-            after_calculated.pop("update_time", None)
             existing_registry['credential'].pop("access_secret", None)
             existing_registry.pop("update_time", None)
+            self.result['registry'] = existing_registry
+
+            comparable_registry = dict(desired_registry, credential={
+                key: value for key, value in desired_registry['credential'].items() if key != "access_secret"
+            })
+            registry_patch = computePatch(comparable_registry, existing_registry)
 
-            if existing_registry == after_calculated:
+            if not registry_patch:
+                self.journalRecord()
                 self.module.exit_json(**self.result)
 
             if self.module.check_mode:
                 self.result['changed'] = True
-                self.result['diff'] = {
-                    "before": json.dumps(existing_registry, indent=4),
-                    "after": json.dumps(after_calculated, indent=4),
-                }
+                self.setDiff(selectPaths(registry_patch, existing_registry), registry_patch)
 
             else:
                 set_request = requests.put(
@@ -127,13 +129,11 @@ class HarborRegistryModule(HarborBaseModule):
                 after = after_request.json()
                 after['credential'].pop("access_secret", None)
                 after.pop("update_time", None)
-                self.result['registry'] = copy.deepcopy(after)
-                if existing_registry != after:
+                self.result['registry'] = after
+                applied = computePatch(after, existing_registry)
+                if applied:
                     self.result['changed'] = True
-                    self.result['diff'] = {
-                        "before": json.dumps(existing_registry, indent=4),
-                        "after": json.dumps(after, indent=4),
-                    }
+                    self.setDiff(selectPaths(applied, existing_registry), applied)
 
         else:
             if not self.module.check_mode:
@@ -149,10 +149,11 @@ class HarborRegistryModule(HarborBaseModule):
                     f"{self.api_url}/registries?q=name%3D{self.module.params['name']}",
                     auth=self.auth
                 )
-                self.result['registry'] = copy.deepcopy(after_request.json())
+                self.result['registry'] = after_request.json()
 
             self.result['changed'] = True
 
+        self.journalRecord()
         self.module.exit_json(**self.result)
 
 def main():
@@ -0,0 +1,155 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_registry_health
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Check health and latency of Harbor registries
+description:
+  - Ping all registry endpoints of Harbor in parallel over API and measure the round-trip latency.
+  - The latency includes the way from this host to Harbor, measure from close to Harbor for comparable numbers.
+options:
+  names:
+    description:
+    - Only check registries with these names. All registries are checked if not set.
+    required: false
+    type: list
+    elements: str
+  samples:
+    description:
+    - Number of pings per registry, the median latency is reported.
+    required: false
+    type: int
+    default: 3
+  latency_slo_ms:
+    description:
+    - Latency in milliseconds above which a registry violates the SLO.
+    required: false
+    type: int
+  fail_on_violation:
+    description:
+    - Fail if a registry is unhealthy or violates the latency SLO.
+    required: false
+    type: bool
+    default: false
+  workers:
+    description:
+    - Number of registries checked in parallel.
+    required: false
+    type: int
+    default: 8
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import copy
+import time
+
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+
+
+class HarborRegistryHealthModule(HarborBaseModule):
+    def listRegistries(self):
+        for registry in self.paginate("/registries"):
+            if self.module.params['names'] is None or registry['name'] in self.module.params['names']:
+                yield registry
+
+    def pingRegistry(self, registry):
+        health = {
+            "name": registry['name'],
+            "id": registry['id'],
+            "url": registry['url'],
+            "healthy": True,
+            "message": None
+        }
+        latencies = []
+        for sample in range(self.module.params['samples']):
+            started = time.monotonic()
+            try:
+                ping_request = requests.post(
+                    f"{self.api_url}/registries/ping",
+                    auth=self.auth,
+                    json={"id": registry['id']}
+                )
+            except requests.exceptions.RequestException as e:
+                health['healthy'] = False
+                health['message'] = str(e)
+                break
+            latencies.append((time.monotonic() - started) * 1000)
+
+            if not ping_request.status_code == 200:
+                health['healthy'] = False
+                health['message'] = self.requestParse(ping_request)
+                break
+
+        latencies.sort()
+        health['latency_ms'] = int(latencies[len(latencies) // 2]) if latencies else None
+        health['slo_violation'] = (
+            self.module.params['latency_slo_ms'] is not None
+            and health['latency_ms'] is not None
+            and health['latency_ms'] > self.module.params['latency_slo_ms']
+        )
+        return health
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            names=dict(type='list', elements='str', required=False),
+            samples=dict(type='int', required=False, default=3),
+            latency_slo_ms=dict(type='int', required=False),
+            fail_on_violation=dict(type='bool', required=False, default=False),
+            workers=dict(type='int', required=False, default=8),
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            registries=[],
+            unhealthy=[],
+            slo_violations=[]
+        )
+
+        try:
+            for registry, health in self.runConcurrently(self.pingRegistry, self.listRegistries(), self.module.params['workers']):
+                self.result['registries'].append(health)
+                if not health['healthy']:
+                    self.result['unhealthy'].append(health['name'])
+                if health['slo_violation']:
+                    self.result['slo_violations'].append(health['name'])
+
+        except HarborApiError as e:
+            self.module.fail_json(msg=str(e), **self.result)
+
+        self.result['registries'].sort(key=lambda health: health['name'])
+        if self.module.params['fail_on_violation'] and (self.result['unhealthy'] or self.result['slo_violations']):
+            self.module.fail_json(
+                msg=f"Unhealthy registries: {self.result['unhealthy']}, SLO violations: {self.result['slo_violations']}",
+                **self.result
+            )
+
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborRegistryHealthModule()
+
+if __name__ == '__main__':
+    main()
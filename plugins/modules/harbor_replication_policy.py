@@ -0,0 +1,407 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_replication_policy
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Manage Harbor replication policies
+description:
+  - Create and update Harbor replication policies over API, many policies at once in parallel.
+  - Can trigger executions of the policies and wait for them to finish.
+options:
+  policies:
+    description:
+    - Replication policies.
+    required: true
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+        - Name of the policy.
+        required: true
+        type: str
+      description:
+        description:
+        - Description of the policy.
+        required: false
+        type: str
+      source_registry:
+        description:
+        - Name of the registry to pull from. Not set for push based replication from this Harbor.
+        required: false
+        type: str
+      dest_registry:
+        description:
+        - Name of the registry to push to. Not set for pull based replication into this Harbor.
+        required: false
+        type: str
+      dest_namespace:
+        description:
+        - Destination namespace, the source namespace is kept if empty.
+        required: false
+        type: str
+        default: ''
+      dest_namespace_replace_count:
+        description:
+        - How many levels of the source namespace are replaced by `dest_namespace` (-1 replaces all).
+        required: false
+        type: int
+        default: -1
+      repositories:
+        description:
+        - Doublestar name filter of repositories.
+        required: false
+        type: str
+      tags:
+        description:
+        - Doublestar filter of tags.
+        required: false
+        type: str
+      resource:
+        description:
+        - Resource type filter.
+        required: false
+        type: str
+        choices: ['image', 'artifact']
+      trigger:
+        description:
+        - When the policy runs.
+        required: false
+        type: str
+        choices: ['manual', 'scheduled', 'event_based']
+        default: 'manual'
+      schedule_cron:
+        description:
+        - Cron of the `scheduled` trigger.
+        required: false
+        type: str
+        default: ''
+      deletion:
+        description:
+        - Replicate deletions.
+        required: false
+        type: bool
+        default: false
+      override:
+        description:
+        - Override existing resources at the destination.
+        required: false
+        type: bool
+        default: true
+      enabled:
+        description:
+        - Enable the policy.
+        required: false
+        type: bool
+        default: true
+      speed:
+        description:
+        - Bandwidth limit in KB/s, -1 for unlimited.
+        required: false
+        type: int
+        default: -1
+      copy_by_chunk:
+        description:
+        - Copy blobs in chunks (Harbor 2.6+).
+        required: false
+        type: bool
+        default: false
+  workers:
+    description:
+    - Number of policies processed in parallel.
+    required: false
+    type: int
+    default: 4
+  run_now:
+    description:
+    - Start one execution of every policy, additionally to its trigger.
+    required: false
+    type: bool
+    default: false
+  wait:
+    description:
+    - Wait for the executions started with `run_now` to finish.
+    - Status, duration and task counts of each execution are returned in `policies.<name>.run`.
+    required: false
+    type: bool
+    default: true
+  wait_timeout:
+    description:
+    - Seconds to wait for each execution to finish.
+    required: false
+    type: int
+    default: 3600
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+  - swisstxt.harbor.checkpoint
+'''
+
+import copy
+import time
+
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.diff import \
+    computePatch, selectPaths
+
+
+class HarborReplicationPolicyModule(HarborBaseModule):
+    RUN_CONTROL_OPTIONS = HarborBaseModule.RUN_CONTROL_OPTIONS + ['workers', 'run_now', 'wait', 'wait_timeout']
+
+    FINAL_STATUSES = ['Succeed', 'Failed', 'Stopped']
+
+    def registryId(self, name):
+        if name is None:
+            return None
+        if name not in self.registries:
+            raise HarborApiError(f"Registry {name} not found")
+        return self.registries[name]
+
+    def constructDesired(self, policy):
+        filters = []
+        for filter_type, option in [('name', 'repositories'), ('tag', 'tags'), ('resource', 'resource')]:
+            if policy[option] is not None:
+                filters.append({"type": filter_type, "value": policy[option]})
+
+        desired = {
+            "name": policy['name'],
+            "description": policy['description'] or '',
+            "dest_namespace": policy['dest_namespace'],
+            "dest_namespace_replace_count": policy['dest_namespace_replace_count'],
+            "filters": filters,
+            "trigger": {
+                "type": policy['trigger'],
+                "trigger_settings": {
+                    "cron": policy['schedule_cron']
+                }
+            },
+            "replicate_deletion": policy['deletion'],
+            "override": policy['override'],
+            "enabled": policy['enabled'],
+            "speed": policy['speed'],
+            "copy_by_chunk": policy['copy_by_chunk']
+        }
+        if policy['source_registry'] is not None:
+            desired['src_registry'] = {"id": self.registryId(policy['source_registry'])}
+        if policy['dest_registry'] is not None:
+            desired['dest_registry'] = {"id": self.registryId(policy['dest_registry'])}
+        return desired
+
+    def normalize(self, policy):
+        # Comparable representation, the local Harbor has registry ID 0
+        trigger = policy.get('trigger') or {}
+        return {
+            "name": policy.get('name'),
+            "description": policy.get('description') or '',
+            "src_registry": ((policy.get('src_registry') or {}).get('id') or None),
+            "dest_registry": ((policy.get('dest_registry') or {}).get('id') or None),
+            "dest_namespace": policy.get('dest_namespace') or '',
+            "dest_namespace_replace_count": policy.get('dest_namespace_replace_count', -1),
+            # A list, so removed filters show up in the patch
+            "filters": sorted([item['type'], item['value']] for item in policy.get('filters') or []),
+            "trigger": trigger.get('type'),
+            "cron": (trigger.get('trigger_settings') or {}).get('cron') or '',
+            "replicate_deletion": policy.get('replicate_deletion', False),
+            "override": policy.get('override', False),
+            "enabled": policy.get('enabled', False),
+            "speed": policy.get('speed', -1),
+            "copy_by_chunk": policy.get('copy_by_chunk', False)
+        }
+
+    def runPolicy(self, policy_id):
+        execution_request = requests.post(
+            f"{self.api_url}/replication/executions",
+            auth=self.auth,
+            json={"policy_id": policy_id}
+        )
+        if not execution_request.status_code == 201:
+            raise HarborApiError(self.requestParse(execution_request))
+        execution_id = int(execution_request.headers['Location'].rstrip("/").rsplit("/", 1)[1])
+
+        run = {
+            "id": execution_id,
+            "status": "InProgress"
+        }
+        if not self.module.params['wait']:
+            return run
+
+        started = time.monotonic()
+
+        def check():
+            status_request = requests.get(
+                f"{self.api_url}/replication/executions/{execution_id}",
+                auth=self.auth
+            )
+            if not status_request.status_code == 200:
+                raise HarborApiError(self.requestParse(status_request))
+            execution = status_request.json()
+            if execution['status'] in self.FINAL_STATUSES:
+                return execution
+            return None
+
+        execution = self.waitFor(
+            check,
+            self.module.params['wait_timeout'],
+            f"Timeout waiting for replication execution {execution_id}"
+        )
+        run.update({
+            "status": execution['status'],
+            "duration": int(time.monotonic() - started),
+            "tasks": {
+                "total": execution.get('total'),
+                "succeed": execution.get('succeed'),
+                "failed": execution.get('failed'),
+                "stopped": execution.get('stopped')
+            }
+        })
+        return run
+
+    def applyPolicy(self, policy):
+        policy_result = {
+            "changed": False
+        }
+        desired = self.constructDesired(policy)
+        existing = self.existing.get(policy['name'])
+
+        if existing is None:
+            policy_result['changed'] = True
+            if self.module.check_mode:
+                return policy_result
+
+            create_request = requests.post(
+                f"{self.api_url}/replication/policies",
+                auth=self.auth,
+                json=desired
+            )
+            if not create_request.status_code == 201:
+                raise HarborApiError(self.requestParse(create_request))
+            policy_id = int(create_request.headers['Location'].rstrip("/").rsplit("/", 1)[1])
+
+        else:
+            policy_id = existing['id']
+            before = self.normalize(existing)
+            policy_patch = computePatch(self.normalize(desired), before)
+            if policy_patch:
+                policy_result['changed'] = True
+                self.setDiff(selectPaths(policy_patch, before), policy_patch, header=policy['name'])
+                if not self.module.check_mode:
+                    set_request = requests.put(
+                        f"{self.api_url}/replication/policies/{policy_id}",
+                        auth=self.auth,
+                        json=dict(desired, id=policy_id)
+                    )
+                    if not set_request.status_code == 200:
+                        raise HarborApiError(self.requestParse(set_request))
+
+        if self.module.params['run_now'] and not self.module.check_mode:
+            policy_result['changed'] = True
+            policy_result['run'] = self.runPolicy(policy_id)
+
+        return policy_result
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            policies=dict(
+                type='list',
+                elements='dict',
+                required=True,
+                options=dict(
+                    name=dict(type='str', required=True),
+                    description=dict(type='str', required=False),
+                    source_registry=dict(type='str', required=False),
+                    dest_registry=dict(type='str', required=False),
+                    dest_namespace=dict(type='str', required=False, default=''),
+                    dest_namespace_replace_count=dict(type='int', required=False, default=-1),
+                    repositories=dict(type='str', required=False),
+                    tags=dict(type='str', required=False),
+                    resource=dict(type='str', required=False, choices=['image', 'artifact']),
+                    trigger=dict(type='str', required=False, default='manual', choices=['manual', 'scheduled', 'event_based']),
+                    schedule_cron=dict(type='str', required=False, default=''),
+                    deletion=dict(type='bool', required=False, default=False),
+                    override=dict(type='bool', required=False, default=True),
+                    enabled=dict(type='bool', required=False, default=True),
+                    speed=dict(type='int', required=False, default=-1),
+                    copy_by_chunk=dict(type='bool', required=False, default=False),
+                ),
+                mutually_exclusive=[
+                    ('source_registry', 'dest_registry')
+                ],
+                required_one_of=[
+                    ('source_registry', 'dest_registry')
+                ],
+                required_if=[
+                    ('trigger', 'scheduled', ('schedule_cron',))
+                ]
+            ),
+            workers=dict(type='int', required=False, default=4),
+            run_now=dict(type='bool', required=False, default=False),
+            wait=dict(type='bool', required=False, default=True),
+            wait_timeout=dict(type='int', required=False, default=3600),
+            state=dict(default='present', choices=['present'])
+        )
+        argument_spec.update(self.CHECKPOINT_ARG_SPEC)
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            policies={}
+        )
+
+        checkpoint = self.openCheckpoint(len(self.module.params['policies']))
+        checkpoint.setPending(policy['name'] for policy in self.module.params['policies'])
+        try:
+            # One listing each instead of one lookup per policy
+            self.registries = {registry['name']: registry['id'] for registry in self.paginate("/registries")}
+            self.existing = {policy['name']: policy for policy in self.paginate("/replication/policies")}
+
+            results = self.runConcurrently(
+                self.applyPolicy,
+                (policy for policy in self.module.params['policies'] if not checkpoint.isDone(policy['name'])),
+                self.module.params['workers']
+            )
+            for policy, policy_result in results:
+                checkpoint.markDone(policy['name'])
+                self.result['policies'][policy['name']] = policy_result
+                if policy_result['changed']:
+                    self.result['changed'] = True
+
+        except HarborApiError as e:
+            self.result['progress'] = checkpoint.save()
+            self.module.fail_json(msg=str(e), **self.result)
+
+        self.result['progress'] = checkpoint.finish()
+
+        failed = [
+            name for name, policy_result in self.result['policies'].items()
+            if policy_result.get('run', {}).get('status') in ['Failed', 'Stopped']
+        ]
+        if failed:
+            self.module.fail_json(msg=f"Replication failed for policies {failed}", **self.result)
+
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborReplicationPolicyModule()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,430 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_retention_policy
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Manage Harbor tag retention and immutability rules
+description:
+  - Create and update the tag retention policy and tag immutability rules of Harbor projects over API.
+  - The same policy is applied to all given projects in parallel.
+  - Can run the retention policy as dry run and summarize which artifacts it would delete.
+options:
+  projects:
+    description:
+    - Names of projects to apply the policy to.
+    required: true
+    type: list
+    elements: str
+  rules:
+    description:
+    - Retention rules, artifacts matched by any rule are retained.
+    - Not managed if not set.
+    required: false
+    type: list
+    elements: dict
+    suboptions:
+      template:
+        description:
+        - Retention rule template.
+        required: true
+        type: str
+        choices: ['always', 'latestPushedK', 'latestPulledN', 'nDaysSinceLastPush', 'nDaysSinceLastPull']
+      value:
+        description:
+        - Count or days of the template, not used for `always`.
+        required: false
+        type: int
+      repositories:
+        description:
+        - Doublestar pattern of repositories the rule applies to.
+        required: false
+        type: str
+        default: '**'
+      tags:
+        description:
+        - Doublestar pattern of tags the rule applies to.
+        required: false
+        type: str
+        default: '**'
+      untagged:
+        description:
+        - Include untagged artifacts.
+        required: false
+        type: bool
+        default: true
+  schedule_cron:
+    description:
+    - Cron of the retention schedule. The policy only runs manually if empty.
+    required: false
+    type: str
+    default: ''
+  immutable_rules:
+    description:
+    - Tag immutability rules, rules not listed are removed.
+    - Not managed if not set.
+    required: false
+    type: list
+    elements: dict
+    suboptions:
+      repositories:
+        description:
+        - Doublestar pattern of repositories.
+        required: false
+        type: str
+        default: '**'
+      tags:
+        description:
+        - Doublestar pattern of immutable tags.
+        required: true
+        type: str
+  dry_run:
+    description:
+    - Run the retention policy as dry run and return a summary per project.
+    required: false
+    type: bool
+    default: false
+  wait_timeout:
+    description:
+    - Seconds to wait for a dry run to finish.
+    required: false
+    type: int
+    default: 1800
+  workers:
+    description:
+    - Number of projects processed in parallel.
+    required: false
+    type: int
+    default: 4
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+  - swisstxt.harbor.checkpoint
+'''
+
+import copy
+import json
+
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.diff import \
+    computePatch, selectPaths
+
+
+class HarborRetentionPolicyModule(HarborBaseModule):
+    RUN_CONTROL_OPTIONS = HarborBaseModule.RUN_CONTROL_OPTIONS + ['dry_run', 'wait_timeout', 'workers']
+
+    FINAL_STATUSES = ['Success', 'Succeed', 'Error', 'Failed', 'Stopped']
+
+    def constructRules(self, rules):
+        # Policy rules in Harbor's format from the module parameters
+        harbor_rules = []
+        for rule in rules:
+            params = {}
+            if rule['template'] != 'always':
+                params[rule['template']] = rule['value']
+
+            harbor_rules.append({
+                "disabled": False,
+                "action": "retain",
+                "template": rule['template'],
+                "params": params,
+                "tag_selectors": [{
+                    "kind": "doublestar",
+                    "decoration": "matches",
+                    "pattern": rule['tags'],
+                    "extras": json.dumps({"untagged": rule['untagged']})
+                }],
+                "scope_selectors": {
+                    "repository": [{
+                        "kind": "doublestar",
+                        "decoration": "repoMatches",
+                        "pattern": rule['repositories']
+                    }]
+                }
+            })
+        return harbor_rules
+
+    def normalizeRules(self, rules):
+        # Comparable representation of Harbor rules, ignoring server side fields
+        normalized = []
+        for rule in rules or []:
+            tag_selector = (rule.get('tag_selectors') or [{}])[0]
+            repository_selector = ((rule.get('scope_selectors') or {}).get('repository') or [{}])[0]
+            normalized.append({
+                "template": rule.get('template'),
+                "params": {key: int(value) for key, value in (rule.get('params') or {}).items()},
+                "tags": tag_selector.get('pattern'),
+                "tag_decoration": tag_selector.get('decoration'),
+                "untagged": json.loads(tag_selector.get('extras') or '{}').get('untagged', False),
+                "repositories": repository_selector.get('pattern'),
+                "repository_decoration": repository_selector.get('decoration'),
+                "disabled": rule.get('disabled', False)
+            })
+        return normalized
+
+    def getRetention(self, retention_id):
+        retention_request = requests.get(
+            f"{self.api_url}/retentions/{retention_id}",
+            auth=self.auth
+        )
+        if not retention_request.status_code == 200:
+            raise HarborApiError(self.requestParse(retention_request))
+
+        return retention_request.json()
+
+    def applyRetention(self, project, project_result):
+        retention_id = project['metadata'].get('retention_id')
+        desired = {
+            "algorithm": "or",
+            "rules": self.constructRules(self.module.params['rules']),
+            "trigger": {
+                "kind": "Schedule",
+                "settings": {
+                    "cron": self.module.params['schedule_cron']
+                }
+            },
+            "scope": {
+                "level": "project",
+                "ref": project['project_id']
+            }
+        }
+
+        if retention_id:
+            existing = self.getRetention(retention_id)
+            before = {
+                "rules": self.normalizeRules(existing.get('rules')),
+                "cron": ((existing.get('trigger') or {}).get('settings') or {}).get('cron', '')
+            }
+        else:
+            before = {}
+        after = {
+            "rules": self.normalizeRules(desired['rules']),
+            "cron": desired['trigger']['settings']['cron']
+        }
+
+        retention_patch = computePatch(after, before)
+        if not retention_patch:
+            return retention_id
+
+        project_result['changed'] = True
+        self.setDiff(selectPaths(retention_patch, before), retention_patch, header=f"{project['name']} retention")
+        if self.module.check_mode:
+            return retention_id
+
+        if retention_id:
+            desired['id'] = int(retention_id)
+            retention_request = requests.put(
+                f"{self.api_url}/retentions/{retention_id}",
+                auth=self.auth,
+                json=desired
+            )
+            if not retention_request.status_code == 200:
+                raise HarborApiError(self.requestParse(retention_request))
+            return retention_id
+
+        retention_request = requests.post(
+            f"{self.api_url}/retentions",
+            auth=self.auth,
+            json=desired
+        )
+        if not retention_request.status_code == 201:
+            raise HarborApiError(self.requestParse(retention_request))
+        return retention_request.headers['Location'].rstrip("/").rsplit("/", 1)[1]
+
+    def applyImmutableRules(self, project, project_result):
+        rules_path = f"{self.api_url}/projects/{project['name']}/immutabletagrules"
+        existing = {}
+        rules_request = requests.get(rules_path, auth=self.auth)
+        if not rules_request.status_code == 200:
+            raise HarborApiError(self.requestParse(rules_request))
+        for rule in rules_request.json() or []:
+            key = (
+                rule['scope_selectors']['repository'][0]['pattern'],
+                rule['tag_selectors'][0]['pattern']
+            )
+            existing[key] = rule['id']
+
+        desired = [(rule['repositories'], rule['tags']) for rule in self.module.params['immutable_rules']]
+        create = [key for key in desired if key not in existing]
+        delete = [existing[key] for key in existing if key not in desired]
+        if not create and not delete:
+            return
+
+        project_result['changed'] = True
+        self.setDiff(sorted(existing), sorted(set(desired)), header=f"{project['name']} immutable rules")
+        if self.module.check_mode:
+            return
+
+        for repositories, tags in create:
+            create_request = requests.post(
+                rules_path,
+                auth=self.auth,
+                json={
+                    "disabled": False,
+                    "action": "immutable",
+                    "template": "immutable_template",
+                    "tag_selectors": [{
+                        "kind": "doublestar",
+                        "decoration": "matches",
+                        "pattern": tags
+                    }],
+                    "scope_selectors": {
+                        "repository": [{
+                            "kind": "doublestar",
+                            "decoration": "repoMatches",
+                            "pattern": repositories
+                        }]
+                    }
+                }
+            )
+            if not create_request.status_code == 201:
+                raise HarborApiError(self.requestParse(create_request))
+
+        for rule_id in delete:
+            delete_request = requests.delete(f"{rules_path}/{rule_id}", auth=self.auth)
+            if not delete_request.status_code == 200:
+                raise HarborApiError(self.requestParse(delete_request))
+
+    def dryRun(self, retention_id):
+        execution_request = requests.post(
+            f"{self.api_url}/retentions/{retention_id}/executions",
+            auth=self.auth,
+            json={"dry_run": True}
+        )
+        if not execution_request.status_code == 201:
+            raise HarborApiError(self.requestParse(execution_request))
+        execution_id = int(execution_request.headers['Location'].rstrip("/").rsplit("/", 1)[1])
+
+        def check():
+            for execution in self.paginate(f"/retentions/{retention_id}/executions"):
+                if execution['id'] == execution_id:
+                    return execution['status'] if execution['status'] in self.FINAL_STATUSES else None
+            return None
+
+        summary = {
+            "status": self.waitFor(check, self.module.params['wait_timeout'], f"Timeout waiting for retention dry run {execution_id}"),
+            "repositories": 0,
+            "total": 0,
+            "retained": 0,
+            "deleted": 0
+        }
+        for task in self.paginate(f"/retentions/{retention_id}/executions/{execution_id}/tasks"):
+            summary['repositories'] += 1
+            summary['total'] += task.get('total') or 0
+            summary['retained'] += task.get('retained') or 0
+        summary['deleted'] = summary['total'] - summary['retained']
+        return summary
+
+    def applyProject(self, project_name):
+        project = self.findProjectByName(project_name)
+        if not project:
+            raise HarborApiError(f"Project {project_name} not found")
+
+        project_result = {
+            "changed": False
+        }
+        retention_id = project['metadata'].get('retention_id')
+        if self.module.params['rules'] is not None:
+            retention_id = self.applyRetention(project, project_result)
+        if self.module.params['immutable_rules'] is not None:
+            self.applyImmutableRules(project, project_result)
+
+        if self.module.params['dry_run'] and retention_id and not self.module.check_mode:
+            project_result['dry_run'] = self.dryRun(retention_id)
+
+        return project_result
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            projects=dict(type='list', elements='str', required=True),
+            rules=dict(
+                type='list',
+                elements='dict',
+                required=False,
+                options=dict(
+                    template=dict(
+                        type='str',
+                        required=True,
+                        choices=['always', 'latestPushedK', 'latestPulledN', 'nDaysSinceLastPush', 'nDaysSinceLastPull']
+                    ),
+                    value=dict(type='int', required=False),
+                    repositories=dict(type='str', required=False, default='**'),
+                    tags=dict(type='str', required=False, default='**'),
+                    untagged=dict(type='bool', required=False, default=True),
+                ),
+                required_if=[
+                    ('template', 'latestPushedK', ('value',)),
+                    ('template', 'latestPulledN', ('value',)),
+                    ('template', 'nDaysSinceLastPush', ('value',)),
+                    ('template', 'nDaysSinceLastPull', ('value',)),
+                ]
+            ),
+            schedule_cron=dict(type='str', required=False, default=''),
+            immutable_rules=dict(
+                type='list',
+                elements='dict',
+                required=False,
+                options=dict(
+                    repositories=dict(type='str', required=False, default='**'),
+                    tags=dict(type='str', required=True),
+                )
+            ),
+            dry_run=dict(type='bool', required=False, default=False),
+            wait_timeout=dict(type='int', required=False, default=1800),
+            workers=dict(type='int', required=False, default=4),
+            state=dict(default='present', choices=['present'])
+        )
+        argument_spec.update(self.CHECKPOINT_ARG_SPEC)
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            projects={}
+        )
+
+        checkpoint = self.openCheckpoint(len(self.module.params['projects']))
+        checkpoint.setPending(self.module.params['projects'])
+        try:
+            results = self.runConcurrently(
+                self.applyProject,
+                (project_name for project_name in self.module.params['projects'] if not checkpoint.isDone(project_name)),
+                self.module.params['workers']
+            )
+            for project_name, project_result in results:
+                checkpoint.markDone(project_name)
+                self.result['projects'][project_name] = project_result
+                if project_result['changed']:
+                    self.result['changed'] = True
+
+        except HarborApiError as e:
+            self.result['progress'] = checkpoint.save()
+            self.module.fail_json(msg=str(e), **self.result)
+
+        self.result['progress'] = checkpoint.finish()
+
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborRetentionPolicyModule()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,331 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_robot_accounts
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Manage many Harbor robot accounts
+description:
+  - Create, update, refresh and delete Harbor robot accounts (Harbor 2.2+) over API.
+  - Existing robots are loaded once, compared locally and changed in parallel.
+  - Secrets of created and refreshed robots are appended to `secrets_file` instead of being returned.
+options:
+  robots:
+    description:
+    - Robot accounts.
+    required: true
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+        - Name of the robot without prefix and project.
+        required: true
+        type: str
+      level:
+        description:
+        - Project or system level robot.
+        required: false
+        type: str
+        choices: ['project', 'system']
+        default: 'project'
+      project:
+        description:
+        - Project of a project level robot.
+        required: false
+        type: str
+      description:
+        description:
+        - Description of the robot.
+        required: false
+        type: str
+        default: ''
+      duration:
+        description:
+        - Days the robot is valid, -1 for never expiring.
+        required: false
+        type: int
+        default: -1
+      disabled:
+        description:
+        - Disable the robot.
+        required: false
+        type: bool
+        default: false
+      permissions:
+        description:
+        - Permissions per project, `namespace` defaults to `project` and `*` means all projects.
+        - System level robots require `namespace` for every permission.
+        - Access is given as `resource:action`, like `repository:pull`.
+        required: false
+        type: list
+        elements: dict
+        default: []
+      refresh_secret:
+        description:
+        - Generate a new secret for an existing robot.
+        required: false
+        type: bool
+        default: false
+      state:
+        description:
+        - State of the robot.
+        required: false
+        type: str
+        choices: ['present', 'absent']
+        default: 'present'
+  secrets_file:
+    description:
+    - File the secrets of created and refreshed robots get appended to as JSON lines, created with mode 0600.
+    - Required if robots get created or refreshed.
+    required: false
+    type: path
+  name_prefix:
+    description:
+    - Robot name prefix configured in Harbor.
+    required: false
+    type: str
+    default: 'robot$'
+  workers:
+    description:
+    - Number of robots changed in parallel.
+    required: false
+    type: int
+    default: 8
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+  - swisstxt.harbor.checkpoint
+'''
+
+import copy
+import json
+import os
+import threading
+
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+
+
+class HarborRobotAccountsModule(HarborBaseModule):
+    RUN_CONTROL_OPTIONS = HarborBaseModule.RUN_CONTROL_OPTIONS + ['workers']
+
+    def fullName(self, robot):
+        if robot['level'] == 'project':
+            return f"{self.module.params['name_prefix']}{robot['project']}+{robot['name']}"
+        return f"{self.module.params['name_prefix']}{robot['name']}"
+
+    def constructPermissions(self, robot):
+        permissions = []
+        for permission in robot['permissions']:
+            access = []
+            for entry in permission.get('access') or []:
+                resource, action = entry.split(":", 1)
+                access.append({"resource": resource, "action": action})
+            permissions.append({
+                "kind": "project",
+                "namespace": permission.get('namespace') or robot['project'],
+                "access": access
+            })
+        return permissions
+
+    def loadExisting(self):
+        # Without a query Harbor only lists system level robots, project level
+        # robots are listed per project
+        existing = {robot['name']: robot for robot in self.paginate("/robots", params={"q": "Level=system"})}
+
+        project_names = sorted(set(
+            robot['project'] for robot in self.module.params['robots']
+            if robot['level'] == 'project'
+        ))
+        for project_name in project_names:
+            project = self.getProjectByName(project_name)
+            if not project:
+                if any(robot['project'] == project_name and robot['state'] == 'present' for robot in self.module.params['robots']):
+                    raise HarborApiError(f"Project {project_name} not found")
+                continue
+            robots = self.paginate("/robots", params={"q": f"Level=project,ProjectID={project['project_id']}"})
+            for robot in robots:
+                existing[robot['name']] = robot
+        return existing
+
+    def normalize(self, robot):
+        # Comparable representation, ignoring order and server side fields
+        return {
+            "description": robot.get('description') or '',
+            "duration": robot.get('duration'),
+            "disable": robot.get('disable', False),
+            "permissions": sorted(
+                (
+                    permission['namespace'],
+                    sorted((access['resource'], access['action']) for access in permission.get('access') or [])
+                )
+                for permission in robot.get('permissions') or []
+            )
+        }
+
+    def writeSecret(self, name, robot_id, secret):
+        with self.secrets_lock:
+            self.secrets_file.write(json.dumps({"name": name, "id": robot_id, "secret": secret}) + "\n")
+            self.secrets_file.flush()
+
+    def applyRobot(self, robot):
+        name = self.fullName(robot)
+        existing = self.existing.get(name)
+
+        if robot['state'] == 'absent':
+            if existing is None:
+                return None
+            if not self.module.check_mode:
+                delete_request = requests.delete(f"{self.api_url}/robots/{existing['id']}", auth=self.auth)
+                if not delete_request.status_code == 200:
+                    raise HarborApiError(self.requestParse(delete_request))
+            return 'deleted'
+
+        desired = {
+            "name": robot['name'],
+            "description": robot['description'],
+            "duration": robot['duration'],
+            "level": robot['level'],
+            "disable": robot['disabled'],
+            "permissions": self.constructPermissions(robot)
+        }
+
+        if existing is None:
+            if not self.module.check_mode:
+                create_request = requests.post(f"{self.api_url}/robots", auth=self.auth, json=desired)
+                if not create_request.status_code == 201:
+                    raise HarborApiError(self.requestParse(create_request))
+                created = create_request.json()
+                self.writeSecret(created['name'], created['id'], created['secret'])
+            return 'created'
+
+        action = None
+        if self.normalize(existing) != self.normalize(desired):
+            action = 'updated'
+            if not self.module.check_mode:
+                set_request = requests.put(
+                    f"{self.api_url}/robots/{existing['id']}",
+                    auth=self.auth,
+                    json=dict(desired, id=existing['id'], name=name, editable=existing.get('editable', True))
+                )
+                if not set_request.status_code == 200:
+                    raise HarborApiError(self.requestParse(set_request))
+
+        if robot['refresh_secret']:
+            action = 'refreshed'
+            if not self.module.check_mode:
+                refresh_request = requests.patch(
+                    f"{self.api_url}/robots/{existing['id']}",
+                    auth=self.auth,
+                    json={}
+                )
+                if not refresh_request.status_code == 200:
+                    raise HarborApiError(self.requestParse(refresh_request))
+                self.writeSecret(name, existing['id'], refresh_request.json()['secret'])
+
+        return action
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            robots=dict(
+                type='list',
+                elements='dict',
+                required=True,
+                options=dict(
+                    name=dict(type='str', required=True),
+                    level=dict(type='str', required=False, default='project', choices=['project', 'system']),
+                    project=dict(type='str', required=False),
+                    description=dict(type='str', required=False, default=''),
+                    duration=dict(type='int', required=False, default=-1),
+                    disabled=dict(type='bool', required=False, default=False),
+                    permissions=dict(type='list', elements='dict', required=False, default=[]),
+                    refresh_secret=dict(type='bool', required=False, default=False, no_log=False),
+                    state=dict(type='str', required=False, default='present', choices=['present', 'absent']),
+                ),
+                required_if=[
+                    ('level', 'project', ('project',))
+                ]
+            ),
+            secrets_file=dict(type='path', required=False),
+            name_prefix=dict(type='str', required=False, default='robot$'),
+            workers=dict(type='int', required=False, default=8),
+        )
+        argument_spec.update(self.CHECKPOINT_ARG_SPEC)
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            created=[],
+            updated=[],
+            refreshed=[],
+            deleted=[]
+        )
+
+        for robot in self.module.params['robots']:
+            if robot['level'] == 'system' and any(not permission.get('namespace') for permission in robot['permissions']):
+                self.module.fail_json(msg=f"Permissions of system level robot {robot['name']} require a namespace", **self.result)
+
+        self.secrets_file = None
+        self.secrets_lock = threading.Lock()
+        checkpoint = self.openCheckpoint(len(self.module.params['robots']))
+        checkpoint.setPending(self.fullName(robot) for robot in self.module.params['robots'])
+        try:
+            self.existing = self.loadExisting()
+
+            needs_secrets = any(
+                robot['state'] == 'present' and (robot['refresh_secret'] or self.fullName(robot) not in self.existing)
+                for robot in self.module.params['robots']
+            )
+            if needs_secrets and not self.module.check_mode:
+                if self.module.params['secrets_file'] is None:
+                    self.module.fail_json(msg="secrets_file is required to store secrets of created or refreshed robots", **self.result)
+                secrets_fd = os.open(self.module.params['secrets_file'], os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+                self.secrets_file = os.fdopen(secrets_fd, 'a')
+
+            results = self.runConcurrently(
+                self.applyRobot,
+                (robot for robot in self.module.params['robots'] if not checkpoint.isDone(self.fullName(robot))),
+                self.module.params['workers']
+            )
+            for robot, action in results:
+                checkpoint.markDone(self.fullName(robot))
+                if action is not None:
+                    self.result[action].append(self.fullName(robot))
+                    self.result['changed'] = True
+
+        except HarborApiError as e:
+            self.result['progress'] = checkpoint.save()
+            self.module.fail_json(msg=str(e), **self.result)
+
+        finally:
+            if self.secrets_file is not None:
+                self.secrets_file.close()
+
+        self.result['progress'] = checkpoint.finish()
+
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborRobotAccountsModule()
+
+if __name__ == '__main__':
+    main()
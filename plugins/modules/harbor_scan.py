@@ -0,0 +1,255 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_scan
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Scan selected Harbor artifacts
+description:
+  - Scan artifacts of given projects over API whose vulnerability scan is missing, too old or made with an outdated scanner.
+  - Repositories and artifacts are streamed, at most `workers` scans run at the same time to limit the load on the scanners.
+options:
+  projects:
+    description:
+    - Names of projects to scan.
+    required: true
+    type: list
+    elements: str
+  max_age_days:
+    description:
+    - Rescan artifacts whose last scan finished more than this many days ago.
+    required: false
+    type: int
+  outdated_scanner:
+    description:
+    - Rescan artifacts scanned with another scanner or scanner version than the one of the project.
+    required: false
+    type: bool
+    default: true
+  workers:
+    description:
+    - Maximum number of scans running at the same time.
+    required: false
+    type: int
+    default: 2
+  wait:
+    description:
+    - Every worker waits for its scan to finish before it starts another one, so at most `workers` scans run at the same time.
+    - Without waiting all selected scans are only triggered and `workers` does not limit the scanner load.
+    required: false
+    type: bool
+    default: true
+  wait_timeout:
+    description:
+    - Seconds to wait for a single scan to finish.
+    required: false
+    type: int
+    default: 1800
+  report_limit:
+    description:
+    - Maximum number of scanned artifacts listed in the result, all are counted in `scanned`.
+    required: false
+    type: int
+    default: 100
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+  - swisstxt.harbor.checkpoint
+'''
+
+import copy
+from datetime import datetime, timedelta
+
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+
+
+class HarborScanModule(HarborBaseModule):
+    RUN_CONTROL_OPTIONS = HarborBaseModule.RUN_CONTROL_OPTIONS + ['workers', 'wait', 'wait_timeout', 'report_limit']
+
+    FINAL_SCAN_STATUSES = ['Success', 'Error', 'Stopped']
+
+    def getProjectScanner(self, project_name):
+        # Name and version of the scanner currently used by the project
+        scanner_request = requests.get(
+            f"{self.api_url}/projects/{project_name}/scanner",
+            auth=self.auth
+        )
+        if not scanner_request.status_code == 200:
+            raise HarborApiError(self.requestParse(scanner_request))
+
+        metadata_request = requests.get(
+            f"{self.api_url}/scanners/{scanner_request.json()['uuid']}/metadata",
+            auth=self.auth
+        )
+        if not metadata_request.status_code == 200:
+            raise HarborApiError(self.requestParse(metadata_request))
+
+        scanner = metadata_request.json()['scanner']
+        return (scanner['name'], scanner['version'])
+
+    def scanOverview(self, artifact):
+        # Overview is keyed by report mime type, vulnerability report is the only one
+        for overview in (artifact.get('scan_overview') or {}).values():
+            return overview
+        return None
+
+    def scanReason(self, artifact, scanner, oldest):
+        overview = self.scanOverview(artifact)
+        if overview is None or overview.get('scan_status') is None:
+            return 'missing'
+        if overview['scan_status'] in ['Error', 'Stopped']:
+            return 'failed'
+        if overview.get('scan_status') not in self.FINAL_SCAN_STATUSES:
+            # Scan already pending or running
+            return None
+
+        if self.module.params['outdated_scanner'] and overview.get('scanner'):
+            if (overview['scanner'].get('name'), overview['scanner'].get('version')) != scanner:
+                return 'outdated_scanner'
+
+        if oldest is not None and overview.get('end_time'):
+            if self.parseTime(overview['end_time']) < oldest:
+                return 'too_old'
+
+        return None
+
+    def selectArtifacts(self, oldest):
+        for project_name in self.module.params['projects']:
+            scanner = self.getProjectScanner(project_name)
+            for repository in self.listRepositories(project_name):
+                artifacts = self.listArtifacts(
+                    project_name,
+                    repository['name'],
+                    params={
+                        "with_scan_overview": "true",
+                        "with_tag": "false"
+                    }
+                )
+                for artifact in artifacts:
+                    reason = self.scanReason(artifact, scanner, oldest)
+                    if reason is None:
+                        continue
+
+                    self.result['reasons'][reason] = self.result['reasons'].get(reason, 0) + 1
+                    yield {
+                        "project": project_name,
+                        "repository": repository['name'],
+                        "digest": artifact['digest'],
+                        "reason": reason
+                    }
+
+    def scanArtifact(self, artifact):
+        artifact_path = f"{self.repositoryPath(artifact['project'], artifact['repository'])}/artifacts/{artifact['digest']}"
+        scan_request = requests.post(
+            f"{self.api_url}{artifact_path}/scan",
+            auth=self.auth
+        )
+        if not scan_request.status_code == 202:
+            raise HarborApiError(self.requestParse(scan_request))
+
+        if not self.module.params['wait']:
+            return 'Pending'
+
+        def check():
+            artifact_request = requests.get(
+                f"{self.api_url}{artifact_path}",
+                auth=self.auth,
+                params={"with_scan_overview": "true"}
+            )
+            if not artifact_request.status_code == 200:
+                raise HarborApiError(self.requestParse(artifact_request))
+
+            overview = self.scanOverview(artifact_request.json()) or {}
+            if overview.get('scan_status') in self.FINAL_SCAN_STATUSES:
+                return overview['scan_status']
+            return None
+
+        return self.waitFor(
+            check,
+            self.module.params['wait_timeout'],
+            f"Timeout waiting for scan of {artifact['repository']}@{artifact['digest']}"
+        )
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            projects=dict(type='list', elements='str', required=True),
+            max_age_days=dict(type='int', required=False),
+            outdated_scanner=dict(type='bool', required=False, default=True),
+            workers=dict(type='int', required=False, default=2),
+            wait=dict(type='bool', required=False, default=True),
+            wait_timeout=dict(type='int', required=False, default=1800),
+            report_limit=dict(type='int', required=False, default=100),
+        )
+        argument_spec.update(self.CHECKPOINT_ARG_SPEC)
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            reasons={},
+            statuses={},
+            scanned=0,
+            artifacts=[]
+        )
+
+        oldest = None
+        if self.module.params['max_age_days'] is not None:
+            oldest = datetime.utcnow() - timedelta(days=self.module.params['max_age_days'])
+
+        checkpoint = self.openCheckpoint(keys=False)
+        try:
+            # Scanned artifacts are not selected again, a resumed run only
+            # carries over the count
+            artifacts = self.selectArtifacts(oldest)
+            if self.module.check_mode:
+                for artifact in artifacts:
+                    self.result['scanned'] += 1
+                    if len(self.result['artifacts']) < self.module.params['report_limit']:
+                        self.result['artifacts'].append(artifact)
+
+            else:
+                scans = self.runConcurrently(
+                    self.scanArtifact,
+                    artifacts,
+                    self.module.params['workers']
+                )
+                for artifact, status in scans:
+                    checkpoint.markDone(f"{artifact['repository']}@{artifact['digest']}")
+                    artifact['status'] = status
+                    self.result['scanned'] += 1
+                    if len(self.result['artifacts']) < self.module.params['report_limit']:
+                        self.result['artifacts'].append(artifact)
+                    self.result['statuses'][status] = self.result['statuses'].get(status, 0) + 1
+
+        except HarborApiError as e:
+            self.result['progress'] = checkpoint.save()
+            self.module.fail_json(msg=str(e), **self.result)
+
+        self.result['progress'] = checkpoint.finish()
+
+        self.result['changed'] = self.result['scanned'] > 0
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborScanModule()
+
+if __name__ == '__main__':
+    main()
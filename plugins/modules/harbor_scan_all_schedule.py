@@ -16,18 +16,19 @@ description:
 
 extends_documentation_fragment:
   - swisstxt.harbor.api
+  - swisstxt.harbor.job
+  - swisstxt.harbor.journal
 '''
 
 import copy
-import json
 
 import requests
 from ansible.module_utils.basic import AnsibleModule
-from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
-    HarborBaseModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.job import \
+    HarborJobBaseModule
 
 
-class HarborScanAllScheduleModule(HarborBaseModule):
+class HarborScanAllScheduleModule(HarborJobBaseModule):
     def getSchedule(self):
         schedule_request = requests.get(
             f"{self.api_url}/system/scanAll/schedule",
@@ -65,15 +66,20 @@ class HarborScanAllScheduleModule(HarborBaseModule):
     def argspec(self):
         argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
         argument_spec.update(
-            schedule_cron=dict(type='str', required=True),
+            schedule_cron=dict(type='str', required=False),
             state=dict(default='present', choices=['present'])
         )
+        argument_spec.update(self.RUN_ARG_SPEC)
+        argument_spec.update(self.JOURNAL_ARG_SPEC)
         return argument_spec
 
     def __init__(self):
         self.module = AnsibleModule(
             argument_spec=self.argspec,
-            supports_check_mode=True
+            supports_check_mode=True,
+            required_if=[
+                ('run_now', False, ('schedule_cron',))
+            ]
         )
 
         super().__init__()
@@ -82,6 +88,14 @@ class HarborScanAllScheduleModule(HarborBaseModule):
             changed=False
         )
 
+        if self.module.params['run_now']:
+            self.runNow('scan_all')
+            self.result['changed'] = True
+
+            if self.module.params['schedule_cron'] is None:
+                self.module.exit_json(**self.result)
+
+        self.journalCheck('scan_all', 'schedule')
         desired = self.constructDesired(self.module.params["schedule_cron"])
         before = self.getSchedule()
 
@@ -89,10 +103,7 @@ class HarborScanAllScheduleModule(HarborBaseModule):
             # Test change with checkmode
             if self.module.check_mode:
                 self.result['changed'] = True
-                self.result['diff'] = {
-                    "before": json.dumps(before, indent=4),
-                    "after": json.dumps(desired, indent=4),
-                }
+                self.setDiff(before, desired)
 
             # Apply change without checkmode
             else:
@@ -101,11 +112,9 @@ class HarborScanAllScheduleModule(HarborBaseModule):
                 after = self.getSchedule()
 
                 self.result['changed'] = True
-                self.result['diff'] = {
-                    "before": json.dumps(before, indent=4),
-                    "after": json.dumps(after, indent=4),
-                }
+                self.setDiff(before, after)
 
+        self.journalRecord()
         self.module.exit_json(**self.result)
 
 
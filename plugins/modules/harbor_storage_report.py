@@ -0,0 +1,368 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_storage_report
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Report storage usage of Harbor repositories
+description:
+  - Sum up the artifact sizes per repository, project and tag pattern over API, repositories are read in parallel.
+  - Sizes are the ones reported by Harbor per artifact, layers shared between different artifacts are counted for each of them.
+  - Every blob (config and layers) is counted once in `unique_size`, no matter how many artifacts, repositories or projects share it.
+    The blobs are read from the manifests over the registry API.
+  - Repositories and projects get the `unique_size` of the blobs first counted for them.
+options:
+  projects:
+    description:
+    - Names of the projects to report.
+    required: true
+    type: list
+    elements: str
+  tag_patterns:
+    description:
+    - Regular expressions of tags to sum up the size for, like `v[0-9.]+` or `pr-.*`.
+    - An artifact counts for a pattern if any of its tags matches.
+    required: false
+    type: list
+    elements: str
+    default: []
+  top:
+    description:
+    - Number of largest repositories returned, C(0) only returns the totals.
+    required: false
+    type: int
+    default: 10
+  dedupe:
+    description:
+    - How artifacts already counted are remembered.
+    - C(exact) keeps a set of digests, C(bloom) uses a fixed size bloom filter for `bloom_capacity` digests and may miss about 0.1% of the unique size.
+    required: false
+    type: str
+    choices: ['exact', 'bloom']
+    default: 'exact'
+  bloom_capacity:
+    description:
+    - Expected number of blobs for `dedupe=bloom`.
+    required: false
+    type: int
+    default: 1000000
+  index_file:
+    description:
+    - File the per repository sums are stored in, one JSON line per repository written as the repository is read.
+    - Repositories which did not change since the last run are taken from the file instead of listing their artifacts.
+    required: false
+    type: path
+  workers:
+    description:
+    - Number of repositories read in parallel.
+    required: false
+    type: int
+    default: 8
+  registry_url:
+    description:
+    - URL of the registry. Defaults to scheme and host of `api_url`.
+    required: false
+    type: str
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import base64
+import copy
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import tempfile
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.registry import \
+    HarborRegistryClient
+
+
+class DigestBloomFilter(object):
+    # Digests are sha256, so their first 64 bits are used as hashes directly
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, key):
+        # Returns False if the key was (probably) added before
+        first, second = key & 0xffffffff, (key >> 32) | 1
+        new = False
+        for i in range(self.hashes):
+            position = (first + i * second) % self.size
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                self.bits[position >> 3] |= 1 << (position & 7)
+                new = True
+        return new
+
+
+class DigestSet(object):
+    def __init__(self):
+        self.digests = set()
+
+    def add(self, key):
+        if key in self.digests:
+            return False
+        self.digests.add(key)
+        return True
+
+
+class HarborStorageReportModule(HarborBaseModule):
+    # First 64 bits of the digest and the size, enough to count each blob once
+    DIGEST_ENTRY = struct.Struct('>QQ')
+    # Indexes of other versions hold other digests
+    INDEX_VERSION = 2
+
+    def loadIndex(self):
+        # The index has a header line and one line per repository. Only the
+        # position of each line is kept, summaries are read when reused.
+        path = self.module.params['index_file']
+        if path is None:
+            return {}
+        try:
+            index_file = open(path, 'rb')
+        except FileNotFoundError:
+            return {}
+        repositories = {}
+        with index_file:
+            try:
+                header = json.loads(index_file.readline())
+                # Sums of other tag patterns or another Harbor can't be reused
+                if header.get('version') != self.INDEX_VERSION \
+                        or header.get('api_url') != self.api_url \
+                        or header.get('tag_patterns') != self.module.params['tag_patterns']:
+                    return {}
+                offset = index_file.tell()
+                for line in index_file:
+                    summary = json.loads(line)
+                    repositories[summary['name']] = (
+                        summary['update_time'],
+                        summary['artifact_count'],
+                        offset,
+                        len(line)
+                    )
+                    offset += len(line)
+            except (ValueError, KeyError, AttributeError):
+                return {}
+        self.previous_fd = os.open(path, os.O_RDONLY)
+        return repositories
+
+    def readSummary(self, offset, length):
+        # pread doesn't move a shared file position, workers read concurrently
+        summary = json.loads(os.pread(self.previous_fd, length, offset))
+        summary['digests'] = base64.b64decode(summary['digests'])
+        return summary
+
+    def openIndex(self):
+        path = self.module.params['index_file']
+        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".storage")
+        temp_file = os.fdopen(temp_fd, 'w')
+        temp_file.write(json.dumps({
+            "version": self.INDEX_VERSION,
+            "api_url": self.api_url,
+            "tag_patterns": self.module.params['tag_patterns']
+        }, separators=(',', ':')) + "\n")
+        return temp_file, temp_path
+
+    def writeSummary(self, index_file, name, summary):
+        index_file.write(json.dumps(
+            dict(summary, name=name, digests=base64.b64encode(summary['digests']).decode()),
+            separators=(',', ':')
+        ) + "\n")
+
+    def removeIndex(self, index_file, index_path):
+        if index_file is None:
+            return
+        index_file.close()
+        if os.path.exists(index_path):
+            os.unlink(index_path)
+
+    def listRepositoriesOfProjects(self):
+        for project_name in self.module.params['projects']:
+            for repository in self.listRepositories(project_name):
+                yield (project_name, repository)
+
+    def artifactBlobs(self, repository_name, digest):
+        # Config and layers with their sizes, of all images of an index
+        manifest = self.registry.getManifest(repository_name, digest)
+        if manifest['mediaType'] in self.registry.INDEX_TYPES or manifest.get('manifests'):
+            blobs = {}
+            for entry in manifest.get('manifests') or []:
+                blobs.update(self.artifactBlobs(repository_name, entry['digest']))
+            return blobs
+        return self.registry.blobSizes(manifest)
+
+    def summarizeRepository(self, item):
+        project_name, repository = item
+
+        # Unchanged since the last run
+        previous = self.previous.get(repository['name'])
+        if previous is not None \
+                and previous[0] == repository.get('update_time') \
+                and previous[1] == repository.get('artifact_count'):
+            return self.readSummary(previous[2], previous[3]), True
+
+        summary = {
+            "update_time": repository.get('update_time'),
+            "artifact_count": repository.get('artifact_count'),
+            "size": 0,
+            "artifacts": 0,
+            "untagged": 0,
+            "patterns": [0] * len(self.tag_patterns)
+        }
+        digests = bytearray()
+        for artifact in self.listArtifacts(project_name, repository['name'], params={"with_tag": "true"}):
+            size = artifact.get('size') or 0
+            tags = [tag['name'] for tag in artifact.get('tags') or []]
+            summary['size'] += size
+            summary['artifacts'] += 1
+            if not tags:
+                summary['untagged'] += size
+            for i, pattern in enumerate(self.tag_patterns):
+                if any(pattern.fullmatch(tag) for tag in tags):
+                    summary['patterns'][i] += size
+            for digest, blob_size in self.artifactBlobs(repository['name'], artifact['digest']).items():
+                digests += self.DIGEST_ENTRY.pack(int(digest.split(':', 1)[-1][:16], 16), blob_size)
+        summary['digests'] = bytes(digests)
+        return summary, False
+
+    def countRepository(self, project_name, repository, summary):
+        # Runs in the main thread, adds the summary to the totals
+        project = self.result['projects'].setdefault(project_name, {"size": 0, "unique_size": 0, "artifacts": 0})
+        project['size'] += summary['size']
+        project['artifacts'] += summary['artifacts']
+        self.result['total_size'] += summary['size']
+        self.result['untagged_size'] += summary['untagged']
+        for i, pattern in enumerate(self.module.params['tag_patterns']):
+            self.result['tag_patterns'][pattern] += summary['patterns'][i]
+
+        unique_size = 0
+        for key, size in self.DIGEST_ENTRY.iter_unpack(summary['digests']):
+            if self.digests.add(key):
+                unique_size += size
+        project['unique_size'] += unique_size
+        self.result['unique_size'] += unique_size
+
+        return {
+            "name": repository['name'],
+            "size": summary['size'],
+            "unique_size": unique_size,
+            "artifacts": summary['artifacts']
+        }
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            projects=dict(type='list', elements='str', required=True),
+            tag_patterns=dict(type='list', elements='str', required=False, default=[]),
+            top=dict(type='int', required=False, default=10),
+            dedupe=dict(type='str', required=False, default='exact', choices=['exact', 'bloom']),
+            bloom_capacity=dict(type='int', required=False, default=1000000),
+            index_file=dict(type='path', required=False),
+            workers=dict(type='int', required=False, default=8),
+            registry_url=dict(type='str', required=False),
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            total_size=0,
+            unique_size=0,
+            untagged_size=0,
+            tag_patterns={pattern: 0 for pattern in self.module.params['tag_patterns']},
+            projects={},
+            repositories=0,
+            refreshed=0,
+            top=[]
+        )
+
+        try:
+            self.tag_patterns = [re.compile(pattern) for pattern in self.module.params['tag_patterns']]
+        except re.error as e:
+            self.module.fail_json(msg=f"Invalid regex: {e}", **self.result)
+        if self.module.params['top'] < 0:
+            self.module.fail_json(msg=f"top must be at least 0, got {self.module.params['top']}", **self.result)
+
+        self.registry = HarborRegistryClient(self.api_url, self.auth, self.module.params['registry_url'])
+        if self.module.params['dedupe'] == 'bloom':
+            self.digests = DigestBloomFilter(self.module.params['bloom_capacity'])
+        else:
+            self.digests = DigestSet()
+
+        self.previous_fd = None
+        self.previous = self.loadIndex()
+        # Summaries are written as the repositories finish, the previous
+        # index is replaced once all of them are written
+        index_file = index_path = None
+        if self.module.params['index_file'] is not None and not self.module.check_mode:
+            try:
+                index_file, index_path = self.openIndex()
+            except OSError as e:
+                self.module.fail_json(msg=f"Could not write index: {e}", **self.result)
+
+        try:
+            # Only the top entries are held in memory, as a min-heap of
+            # (size, position, consumer)
+            top = []
+            summaries = self.runConcurrently(
+                self.summarizeRepository,
+                self.listRepositoriesOfProjects(),
+                self.module.params['workers']
+            )
+            for position, ((project_name, repository), (summary, reused)) in enumerate(summaries):
+                self.result['repositories'] += 1
+                if not reused:
+                    self.result['refreshed'] += 1
+                if index_file is not None:
+                    self.writeSummary(index_file, repository['name'], summary)
+                consumer = self.countRepository(project_name, repository, summary)
+                if len(top) < self.module.params['top']:
+                    heapq.heappush(top, (consumer['size'], -position, consumer))
+                elif top and consumer['size'] > top[0][0]:
+                    heapq.heapreplace(top, (consumer['size'], -position, consumer))
+            self.result['top'] = [consumer for size, position, consumer in sorted(top, reverse=True)]
+
+            if index_file is not None:
+                index_file.close()
+                os.replace(index_path, self.module.params['index_file'])
+
+        except HarborApiError as e:
+            self.removeIndex(index_file, index_path)
+            self.module.fail_json(msg=str(e), **self.result)
+        except OSError as e:
+            self.removeIndex(index_file, index_path)
+            self.module.fail_json(msg=f"Could not write index: {e}", **self.result)
+        finally:
+            if self.previous_fd is not None:
+                os.close(self.previous_fd)
+
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborStorageReportModule()
+
+if __name__ == '__main__':
+    main()
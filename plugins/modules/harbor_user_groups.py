@@ -0,0 +1,217 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# (c) 2021, Joshua Hügli <@joschi36>
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+DOCUMENTATION = '''
+---
+module: harbor_user_groups
+author:
+  - Joshua Hügli (@joschi36)
+version_added: ""
+short_description: Import many Harbor user groups
+description:
+  - Import user groups into Harbor over API, missing groups are resolved and created in parallel.
+  - LDAP groups without `ldap_group_dn` are resolved with the LDAP group search of Harbor.
+  - Returns an index of all user groups by type and name and by LDAP DN to their ID, see `group_id` of `harbor_project_member`.
+  - Groups of different types may have the same name, so `groups` maps each type (`ldap`, `http`, `oidc`) to the names of its groups.
+options:
+  groups:
+    description:
+    - User groups.
+    required: true
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+        - Name of the group.
+        required: true
+        type: str
+      type:
+        description:
+        - Type of the group.
+        required: false
+        type: str
+        choices: ['ldap', 'http', 'oidc']
+        default: 'ldap'
+      ldap_group_dn:
+        description:
+        - DN of the LDAP group, searched by name if not set.
+        required: false
+        type: str
+  index_file:
+    description:
+    - File the index of group types and names and of DNs to IDs is written to as JSON.
+    required: false
+    type: path
+  workers:
+    description:
+    - Number of groups resolved and created in parallel.
+    required: false
+    type: int
+    default: 8
+extends_documentation_fragment:
+  - swisstxt.harbor.api
+'''
+
+import copy
+import json
+import os
+import tempfile
+
+import requests
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.swisstxt.harbor.plugins.module_utils.base import \
+    HarborApiError, HarborBaseModule
+
+
+class HarborUserGroupsModule(HarborBaseModule):
+    GROUP_TYPES = {
+        'ldap': 1,
+        'http': 2,
+        'oidc': 3
+    }
+
+    def findExisting(self, group):
+        if group['type'] == 'ldap' and group['ldap_group_dn'] is not None:
+            return self.by_dn.get(group['ldap_group_dn'].lower())
+        return self.by_name.get((self.GROUP_TYPES[group['type']], group['name']))
+
+    def searchLdapGroup(self, name):
+        search_request = requests.get(
+            f"{self.api_url}/ldap/groups/search",
+            auth=self.auth,
+            params={"groupname": name}
+        )
+        if not search_request.status_code == 200:
+            raise HarborApiError(self.requestParse(search_request))
+
+        # The search matches substrings
+        found = [
+            group for group in search_request.json() or []
+            if group['group_name'].lower() == name.lower()
+        ]
+        if not found:
+            raise HarborApiError(f"LDAP group {name} not found")
+        if len(found) > 1:
+            raise HarborApiError(f"LDAP group {name} is ambiguous: {[group['ldap_group_dn'] for group in found]}")
+        return found[0]['ldap_group_dn']
+
+    def importGroup(self, group):
+        imported = {
+            "group_name": group['name'],
+            "group_type": self.GROUP_TYPES[group['type']]
+        }
+        if group['type'] == 'ldap':
+            imported['ldap_group_dn'] = group['ldap_group_dn'] or self.searchLdapGroup(group['name'])
+            # Known under its DN, e.g. with another name
+            existing = self.by_dn.get(imported['ldap_group_dn'].lower())
+            if existing is not None:
+                return existing, False
+
+        if self.module.check_mode:
+            return dict(imported, id=None), True
+
+        create_request = requests.post(
+            f"{self.api_url}/usergroups",
+            auth=self.auth,
+            json=imported
+        )
+        if not create_request.status_code == 201:
+            raise HarborApiError(self.requestParse(create_request))
+        imported['id'] = int(create_request.headers['Location'].rstrip("/").rsplit("/", 1)[1])
+        return imported, True
+
+    def addToIndex(self, group):
+        self.by_name[(group['group_type'], group['group_name'])] = group
+        if group.get('ldap_group_dn'):
+            self.by_dn[group['ldap_group_dn'].lower()] = group
+
+    def writeIndex(self, index):
+        path = self.module.params['index_file']
+        temp_fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".groups")
+        try:
+            with os.fdopen(temp_fd, 'w') as temp_file:
+                json.dump(index, temp_file, indent=2, sort_keys=True)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    @property
+    def argspec(self):
+        argument_spec = copy.deepcopy(self.COMMON_ARG_SPEC)
+        argument_spec.update(
+            groups=dict(
+                type='list',
+                elements='dict',
+                required=True,
+                options=dict(
+                    name=dict(type='str', required=True),
+                    type=dict(type='str', required=False, default='ldap', choices=['ldap', 'http', 'oidc']),
+                    ldap_group_dn=dict(type='str', required=False),
+                )
+            ),
+            index_file=dict(type='path', required=False),
+            workers=dict(type='int', required=False, default=8),
+            state=dict(default='present', choices=['present'])
+        )
+        return argument_spec
+
+    def __init__(self):
+        self.module = AnsibleModule(
+            argument_spec=self.argspec,
+            supports_check_mode=True
+        )
+
+        super().__init__()
+
+        self.result = dict(
+            changed=False,
+            created=[]
+        )
+
+        try:
+            # One listing instead of one lookup per group
+            self.by_name = {}
+            self.by_dn = {}
+            for group in self.paginate("/usergroups"):
+                self.addToIndex(group)
+
+            missing = [group for group in self.module.params['groups'] if self.findExisting(group) is None]
+            results = self.runConcurrently(self.importGroup, missing, self.module.params['workers'])
+            for group, (imported, created) in results:
+                if created:
+                    self.result['created'].append(group['name'])
+                    self.result['changed'] = True
+                if imported['id'] is not None:
+                    self.addToIndex(imported)
+
+        except HarborApiError as e:
+            self.module.fail_json(msg=str(e), **self.result)
+
+        type_names = {group_type: name for name, group_type in self.GROUP_TYPES.items()}
+        self.result['groups'] = {name: {} for name in self.GROUP_TYPES}
+        for (group_type, group_name), group in self.by_name.items():
+            self.result['groups'].setdefault(type_names.get(group_type, str(group_type)), {})[group_name] = group['id']
+        self.result['ldap_groups'] = {group['ldap_group_dn']: group['id'] for group in self.by_dn.values()}
+
+        if self.module.params['index_file'] is not None and not self.module.check_mode:
+            try:
+                self.writeIndex({
+                    "groups": self.result['groups'],
+                    "ldap_groups": self.result['ldap_groups']
+                })
+            except OSError as e:
+                self.module.fail_json(msg=f"Could not write index: {e}", **self.result)
+
+        self.module.exit_json(**self.result)
+
+
+def main():
+    HarborUserGroupsModule()
+
+if __name__ == '__main__':
+    main()